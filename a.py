@@ -1,14 +1,209 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox, Frame, Label
-import requests
+import tkinter.font as tkfont
 import json
 import threading
 import os
 import webbrowser
-from datetime import datetime
+from datetime import datetime, timedelta
 import pyperclip  # 用于复制到剪贴板，需安装：pip install pyperclip
 import queue
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from mclogs_core import (
+    CACHE_DIR, DEFAULT_API_BASE, LARGE_FILE_THRESHOLD, LOG_LINE_PATTERN,
+    FleetMonitor, LogDirectoryIndex, expand_log_dirs, PagedFile, LogRecords, SearchIndex, IncrementalAnalyzer,
+    LocalAnalyzer,
+    PersistentLRUCache, ApiClient, LogUploader, BatchUploader, CrashClusterIndex, JobQueue, JobQueueFull,
+    LogTimeSeries, GzipLineIndex, ConcatenatedLog, InsightsFetcher, detect_encoding, iter_log_chunks,
+    iter_logs_lines, metrics,
+)
+
+
+class SyntaxHighlighter:
+    """日志语法高亮：优先处理可视区域，其余部分分片在空闲时完成"""
+    
+    TAGS = ('ERROR', 'WARN', 'INFO', 'DEBUG', 'TIMESTAMP')
+    
+    def __init__(self, text, slice_lines=2000, margin=200):
+        self.text = text
+        self.slice_lines = slice_lines
+        self.margin = margin
+        self._pending = []
+        self._job = None
+        self.records = None  # 与文本内容一致的结构化记录，可用时不再逐行匹配
+    
+    def highlight_all(self):
+        """重新高亮全部内容"""
+        self.cancel()
+        for tag in self.TAGS:
+            self.text.tag_remove(tag, '1.0', 'end')
+        
+        total = self._line_count()
+        first, last = self._visible_range(total)
+        self.highlight_lines(first, last)
+        
+        # 其余行先向下、再向上分片，通过 after 逐片处理以保持界面响应
+        n = self.slice_lines
+        self._pending = [(start, min(start + n - 1, total))
+                         for start in range(last + 1, total + 1, n)]
+        self._pending += [(max(end - n + 1, 1), end)
+                          for end in range(first - 1, 0, -n)]
+        self._schedule()
+    
+    def cancel(self):
+        """取消尚未完成的后台高亮"""
+        if self._job is not None:
+            self.text.after_cancel(self._job)
+            self._job = None
+        self._pending = []
+    
+    @metrics.timed('highlight.lines')
+    def highlight_lines(self, first, last):
+        """只重新高亮第 first 到 last 行"""
+        start, end = f"{first}.0", f"{last}.end"
+        for tag in self.TAGS:
+            self.text.tag_remove(tag, start, end)
+        
+        ranges = {tag: [] for tag in self.TAGS}
+        if self.records is not None:
+            for line, ts_end, level in self.records.headers(first - 1, last):
+                i = line + 1
+                ranges['TIMESTAMP'] += (f"{i}.0", f"{i}.{ts_end}")
+                if level:
+                    ranges[level] += (f"{i}.0", f"{i}.end")
+        else:
+            content = self.text.get(start, end)
+            for i, line in enumerate(content.split('\n'), first):
+                match = LOG_LINE_PATTERN.match(line)
+                ts_end = match.end('timestamp')
+                if ts_end > 0:
+                    ranges['TIMESTAMP'] += (f"{i}.0", f"{i}.{ts_end}")
+                level = match.group('level')
+                if level:
+                    ranges[level.upper()] += (f"{i}.0", f"{i}.end")
+        
+        # 每种标签一次 tag_add 调用，减少 Tk 往返
+        for tag, indices in ranges.items():
+            if indices:
+                self.text.tag_add(tag, *indices)
+    
+    def _schedule(self):
+        if self._pending:
+            self._job = self.text.after(1, self._run_slice)
+    
+    def _run_slice(self):
+        self._job = None
+        first, last = self._pending.pop(0)
+        self.highlight_lines(first, last)
+        self._schedule()
+    
+    def _line_count(self):
+        return int(self.text.index('end-1c').split('.')[0])
+    
+    def _visible_range(self, total):
+        first = int(self.text.index('@0,0').split('.')[0])
+        last = int(self.text.index(f"@0,{self.text.winfo_height()}").split('.')[0])
+        return max(first - self.margin, 1), min(last + self.margin, total)
+
+
+class VirtualLogView(ttk.Frame):
+    """虚拟化日志查看器：基于行偏移索引，只渲染可见的行，滚动条按行号映射"""
+    
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.index = None
+        self.top = 0
+        
+        self.text = tk.Text(self, wrap='none', state='disabled', height=15)
+        self.vbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.hbar = ttk.Scrollbar(self, orient='horizontal', command=self.text.xview)
+        self.text.config(xscrollcommand=self.hbar.set)
+        self.linespace = tkfont.Font(font=self.text.cget('font')).metrics('linespace')
+        self.position_var = tk.StringVar()
+        
+        self.text.grid(row=0, column=0, sticky='nsew')
+        self.vbar.grid(row=0, column=1, sticky='ns')
+        self.hbar.grid(row=1, column=0, sticky='ew')
+        ttk.Label(self, textvariable=self.position_var).grid(row=2, column=0, sticky='w')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        
+        self.text.bind('<Configure>', lambda e: self.render())
+        self.text.bind('<MouseWheel>', self._on_wheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll_to(self.top - 3))
+        self.text.bind('<Button-5>', lambda e: self.scroll_to(self.top + 3))
+        for key, step in (('<Up>', -1), ('<Down>', 1)):
+            self.text.bind(key, lambda e, step=step: self.scroll_to(self.top + step))
+        for key, pages in (('<Prior>', -1), ('<Next>', 1)):
+            self.text.bind(key, lambda e, pages=pages: self.scroll_to(self.top + pages * self._rows()))
+        self.text.bind('<Home>', lambda e: self.scroll_to(0))
+        self.text.bind('<End>', lambda e: self.scroll_to(len(self.index or ())))
+    
+    def open(self, paths):
+        """打开日志文件（可以是多个文件或 .gz 归档，按顺序拼接显示），后台建立索引，首屏立即显示"""
+        self.close()
+        self.index = ConcatenatedLog([paths] if isinstance(paths, str) else paths)
+        self.top = 0
+        thread = threading.Thread(target=self.index.build, daemon=True)
+        thread.start()
+        self._refresh_while_building(self.index)
+    
+    def close(self):
+        """关闭当前文件并清空显示"""
+        if self.index:
+            self.index.close()
+            self.index = None
+        self.top = 0
+        self.render()
+    
+    def scroll_to(self, line):
+        """将第 line 行（从0开始）滚动到顶部"""
+        total = len(self.index or ())
+        self.top = max(0, min(line, total - self._rows()))
+        self.render()
+        return 'break'
+    
+    def render(self):
+        """只渲染可见区域的行"""
+        rows = self._rows()
+        lines = self.index.lines(self.top, rows) if self.index else []
+        
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', '\n'.join(lines))
+        self.text.config(state='disabled')
+        
+        total = len(self.index or ())
+        if total:
+            self.vbar.set(self.top / total, min(self.top + rows, total) / total)
+            suffix = "" if self.index.complete else " (正在建立索引...)"
+            self.position_var.set(f"第 {self.top + 1} - {min(self.top + rows, total)} 行 / 共 {total} 行{suffix}")
+        else:
+            self.vbar.set(0, 1)
+            self.position_var.set("")
+    
+    def _refresh_while_building(self, index):
+        if index is not self.index:
+            return
+        self.render()
+        if not index.complete:
+            self.after(200, self._refresh_while_building, index)
+    
+    def _rows(self):
+        return max(1, self.text.winfo_height() // self.linespace)
+    
+    def _on_scrollbar(self, action, value, unit=None):
+        total = len(self.index or ())
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * total))
+        elif action == 'scroll':
+            step = int(value) * (self._rows() if unit == 'pages' else 1)
+            self.scroll_to(self.top + step)
+    
+    def _on_wheel(self, event):
+        return self.scroll_to(self.top - 3 * (1 if event.delta > 0 else -1))
+
 
 class MinecraftLogAnalyzerPro:
     def __init__(self, root):
@@ -16,26 +211,84 @@ class MinecraftLogAnalyzerPro:
         self.root.title("Minecraft 日志分析工具 (完整版)")
         self.root.geometry("900x700")
         
-        # API配置
-        self.api_base = "https://api.mclo.gs/1"
-        self.api_url = f"{self.api_base}/log"
-        self.insights_url = f"{self.api_base}/insights"
+        # API配置（所有请求共用同一个连接池）
+        self.api = ApiClient(DEFAULT_API_BASE)
         
         # 存储日志ID和URL
         self.current_log_id = None
         self.current_log_url = None
         
+        # 后台任务队列：上传、本地分析、API请求共用，并发有上限，同类任务只保留最新一次
+        self.jobs = JobQueue(on_change=lambda depth: self.root.after(0, self._show_queue_depth, depth))
+        
+        # 增量分析：编辑后本地只重新分析变化的块，停止编辑一段时间后才重新上传
+        self.incremental_analyzer = None
+        self.reupload_delay = 10000  # 毫秒
+        self._reupload_job = None
+        self._uploaded_content = None
+        # 只有用户编辑才安排重新上传；载入文件、翻页等程序写入同样触发 <<Modified>>
+        self._user_edited = False
+        
+        # 全文搜索线程（建立索引、搜索、关闭旧索引依次执行）
+        self.search_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search')
+        self._search_index = None
+        self._search_text = None
+        self._search_future = None
+        self.search_hits = []
+        self.search_pos = -1
+        
+        # 文本框内容的结构化记录（高亮与搜索共用一次解析）
+        self._records_future = None
+        self._records_text = None
+        
+        # 上传结果缓存：相同内容不再重复上传
+        self.upload_cache = PersistentLRUCache(os.path.join(CACHE_DIR, 'uploads.json'))
+        self.uploader = LogUploader(self.api, self.upload_cache)
+        # mclo.gs 的分析结果按日志ID与内容哈希缓存
+        self.insights = InsightsFetcher(self.api, PersistentLRUCache(os.path.join(CACHE_DIR, 'insights.json')))
+        # 崩溃报告按堆栈指纹聚类，同类报告只上传一次
+        self.crash_clusters = CrashClusterIndex(os.path.join(CACHE_DIR, 'crash_clusters.json'))
+        # 按分钟统计的服务器指标，由监控到的新行增量更新
+        self.time_series = LogTimeSeries()
+        
         # 创建标签页界面
         self.create_notebook()
         
         # 启动日志监控线程（模拟插件功能）
         self.log_queue = queue.Queue()
         self.monitoring = False
+        self.monitor_requests = queue.Queue()  # 界面线程创建的监控器，由监控线程依次运行
+        self.log_monitor = None
+        self._log_dir_job = None
+        self.dir_indexes = {}
         self.start_log_monitor()
         
         # 设置样式
         self.setup_styles()
     
+    @property
+    def api_base(self):
+        return self.api.base_url
+    
+    @property
+    def api_url(self):
+        return f"{self.api_base}/log"
+    
+    @property
+    def insights_url(self):
+        return f"{self.api_base}/insights"
+    
+    def _sync_api_client(self):
+        """将配置页中的端点与超时同步到HTTP客户端（在主线程调用）"""
+        try:
+            timeout = self.timeout_var.get()
+        except tk.TclError:
+            timeout = None
+        self.api.configure(base_url=self.custom_api_var.get().strip() or DEFAULT_API_BASE,
+                           timeout=timeout)
+        self.uploader.pipeline.compress = self.compress_var.get()
+        self.uploader.pipeline.redact = self.auto_hide_ip.get()
+    
     def setup_styles(self):
         """设置界面样式"""
         style = ttk.Style()
@@ -55,6 +308,8 @@ class MinecraftLogAnalyzerPro:
         self.create_plugin_tab(notebook)
         self.create_mod_tab(notebook)
         self.create_api_tab(notebook)
+        self.create_stats_tab(notebook)
+        self.create_perf_tab(notebook)
         self.create_config_tab(notebook)
         
         # 状态栏
@@ -88,15 +343,89 @@ class MinecraftLogAnalyzerPro:
         ttk.Checkbutton(option_frame, text="自动分析", 
                        variable=self.auto_analyze).pack(side='left', padx=5)
         
+        # 全文搜索（大文件使用持久化索引）
+        search_frame = ttk.Frame(tab)
+        search_frame.pack(fill='x', padx=10, pady=(0, 5))
+        
+        ttk.Label(search_frame, text="搜索:").pack(side='left')
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
+        search_entry.pack(side='left', padx=2)
+        search_entry.bind('<Return>', lambda e: self.run_search())
+        self.search_level_var = tk.StringVar(value="全部")
+        ttk.Combobox(search_frame, textvariable=self.search_level_var, state='readonly', width=8,
+                     values=("全部",) + SearchIndex.LEVELS).pack(side='left', padx=2)
+        ttk.Button(search_frame, text="搜索", 
+                  command=self.run_search).pack(side='left', padx=2)
+        ttk.Button(search_frame, text="上一个", 
+                  command=lambda: self.goto_search_hit(-1)).pack(side='left', padx=2)
+        ttk.Button(search_frame, text="下一个", 
+                  command=lambda: self.goto_search_hit(1)).pack(side='left', padx=2)
+        self.search_result_var = tk.StringVar()
+        ttk.Label(search_frame, textvariable=self.search_result_var).pack(side='left', padx=10)
+        
+        # 大文件分页浏览（仅在分页模式下显示）
+        self.page_frame = ttk.Frame(tab)
+        ttk.Button(self.page_frame, text="上一页", 
+                  command=lambda: self.show_page(self.current_page - 1)).pack(side='left', padx=2)
+        ttk.Button(self.page_frame, text="下一页", 
+                  command=lambda: self.show_page(self.current_page + 1)).pack(side='left', padx=2)
+        self.page_var = tk.StringVar()
+        ttk.Label(self.page_frame, textvariable=self.page_var).pack(side='left', padx=10)
+        self.paged_file = None
+        self.current_page = 0
+        
         # 日志输入区域
         input_frame = ttk.LabelFrame(tab, text="日志内容", padding=10)
         input_frame.pack(fill='both', expand=True, padx=10, pady=(0,10))
+        self.log_input_frame = input_frame
         
         self.log_text = self.create_syntax_text(input_frame)
         self.log_text.pack(fill='both', expand=True)
         
+        # 编辑时只重新高亮发生变化的行
+        self.highlighter = SyntaxHighlighter(self.log_text)
+        self.log_text.bind('<KeyRelease>', self.on_text_edited)
+        self.log_text.bind('<<Paste>>', self.on_text_pasted)
+        self.log_text.bind('<<Cut>>', self.on_text_cut)
+        
         # 绑定文本变化事件（用于实时分析）
         self.log_text.bind('<<Modified>>', self.on_text_modified)
+        
+        # 分析结果：本地分析与 mclo.gs 分析各占一页
+        result_notebook = ttk.Notebook(tab)
+        result_notebook.pack(fill='x', padx=10, pady=(0,10))
+        self.result_notebook = result_notebook
+        
+        result_frame = ttk.Frame(result_notebook, padding=5)
+        result_notebook.add(result_frame, text="本地分析结果")
+        
+        columns = ('type', 'message', 'line', 'count')
+        self.problem_tree = ttk.Treeview(result_frame, columns=columns, 
+                                         show='headings', height=5)
+        for column, heading, width in zip(columns, ("类型", "描述", "行号", "次数"), 
+                                          (80, 520, 60, 60)):
+            self.problem_tree.heading(column, text=heading)
+            self.problem_tree.column(column, width=width, stretch=(column == 'message'))
+        self.problem_tree.pack(fill='x')
+        self.problem_tree.bind('<Double-1>', self.on_problem_selected)
+        
+        insights_frame = ttk.Frame(result_notebook, padding=5)
+        result_notebook.add(insights_frame, text="mclo.gs 分析结果")
+        self.insights_frame = insights_frame
+        
+        self.insights_title_var = tk.StringVar(value="上传日志后显示 mclo.gs 的分析结果")
+        ttk.Label(insights_frame, textvariable=self.insights_title_var).pack(anchor='w')
+        
+        # 问题下挂解决方案，信息（版本、加载器等）单独一组
+        self.insights_tree = ttk.Treeview(insights_frame, columns=('value', 'line', 'count'), height=5)
+        self.insights_tree.heading('#0', text="内容")
+        self.insights_tree.column('#0', width=480)
+        for column, heading, width in (('value', "值", 160), ('line', "行号", 60), ('count', "次数", 60)):
+            self.insights_tree.heading(column, text=heading)
+            self.insights_tree.column(column, width=width, stretch=False)
+        self.insights_tree.pack(fill='x')
+        self._insights_log_id = None
     
     def create_share_tab(self, notebook):
         """创建分享标签页"""
@@ -113,6 +442,8 @@ class MinecraftLogAnalyzerPro:
                   command=self.copy_share_link).pack(side='left', padx=5)
         ttk.Button(control_frame, text="在浏览器打开", 
                   command=self.open_in_browser).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="查看分析结果", 
+                  command=self.open_shared_log).pack(side='left', padx=5)
         
         # 分享信息显示
         info_frame = ttk.LabelFrame(tab, text="分享信息", padding=10)
@@ -170,10 +501,16 @@ class MinecraftLogAnalyzerPro:
         
         ttk.Label(dir_frame, text="日志目录:").pack(side='left')
         self.log_dir_var = tk.StringVar(value=".minecraft/logs")
-        ttk.Entry(dir_frame, textvariable=self.log_dir_var, 
-                 width=40).pack(side='left', padx=5, fill='x', expand=True)
+        # 输入停顿后（或回车、离开输入框时）才按新目录重启监控，不在每次按键时重建
+        self.log_dir_var.trace_add('write', self._schedule_monitor_restart)
+        dir_entry = ttk.Entry(dir_frame, textvariable=self.log_dir_var, width=40)
+        dir_entry.pack(side='left', padx=5, fill='x', expand=True)
+        dir_entry.bind('<Return>', self._restart_log_monitor)
+        dir_entry.bind('<FocusOut>', self._restart_log_monitor)
         ttk.Button(dir_frame, text="浏览", 
                   command=self.browse_log_dir).pack(side='left')
+        ttk.Label(monitor_frame, text="多个服务器用 ; 分隔，支持通配符，例如 /srv/mc/*/logs", 
+                 style='Info.TLabel').pack(anchor='w')
         
         # 监控控制
         control_frame = ttk.Frame(monitor_frame)
@@ -185,13 +522,17 @@ class MinecraftLogAnalyzerPro:
         
         ttk.Button(control_frame, text="手动上传最新日志", 
                   command=self.upload_latest_log).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="批量上传目录", 
+                  command=self.batch_upload_directory).pack(side='left', padx=5)
+        ttk.Button(control_frame, text="打开历史日志", 
+                  command=self.open_log_history).pack(side='left', padx=5)
         
         # 权限设置
         perm_frame = ttk.LabelFrame(tab, text="权限管理", padding=10)
         perm_frame.pack(fill='x', padx=10, pady=5)
         
         self.auto_hide_ip = tk.BooleanVar(value=True)
-        ttk.Checkbutton(perm_frame, text="自动隐藏IP地址", 
+        ttk.Checkbutton(perm_frame, text="自动隐藏IP地址（上传前同时隐藏UUID、玩家名与用户目录）", 
                        variable=self.auto_hide_ip).pack(anchor='w')
         
         self.allow_team_share = tk.BooleanVar(value=True)
@@ -255,13 +596,15 @@ class MinecraftLogAnalyzerPro:
                   command=self.upload_crash_report).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="查看最新日志", 
                   command=self.view_latest_client_log).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="查看历史日志", 
+                  command=self.view_client_log_history).pack(side='left', padx=5)
         
         # 客户端日志显示
         display_frame = ttk.LabelFrame(tab, text="日志内容", padding=10)
         display_frame.pack(fill='both', expand=True, padx=10, pady=5)
         
-        self.client_log_text = scrolledtext.ScrolledText(display_frame, height=15)
-        self.client_log_text.pack(fill='both', expand=True)
+        self.client_log_view = VirtualLogView(display_frame)
+        self.client_log_view.pack(fill='both', expand=True)
     
     def create_api_tab(self, notebook):
         """创建API集成标签页"""
@@ -280,7 +623,7 @@ class MinecraftLogAnalyzerPro:
         
         ttk.Label(endpoint_frame, text="选择端点:").pack(side='left')
         self.api_endpoint_var = tk.StringVar(value="/log")
-        endpoints = ["/log", "/insights", "/raw/{id}", "/download/{id}"]
+        endpoints = ["/log", "/insights/{id}", "/raw/{id}", "/download/{id}"]
         ttk.Combobox(endpoint_frame, textvariable=self.api_endpoint_var, 
                     values=endpoints, width=20).pack(side='left', padx=5)
         
@@ -315,6 +658,180 @@ class MinecraftLogAnalyzerPro:
         self.response_time_var = tk.StringVar()
         ttk.Label(info_frame, textvariable=self.response_time_var).pack(side='left', padx=5)
     
+    # 统计页的图表：(标题, [(指标, 颜色)])
+    STATS_PANELS = (
+        ("ERROR / WARN", [('errors', 'red'), ('warns', 'orange')]),
+        ("卡顿 (最长落后 ms)", [('lag_max_ms', 'purple')]),
+        ("玩家加入 / 离开", [('joins', 'green'), ('leaves', 'gray')]),
+        ("保存耗时 (ms)", [('save_ms', 'blue')]),
+    )
+    
+    def create_stats_tab(self, notebook):
+        """创建统计标签页：按分钟绘制错误/警告数、卡顿、玩家进出与保存耗时"""
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="统计")
+        
+        control_frame = ttk.Frame(tab)
+        control_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(control_frame, text="时间范围:").pack(side='left')
+        self.stats_window_var = tk.StringVar(value="60 分钟")
+        window_combo = ttk.Combobox(control_frame, textvariable=self.stats_window_var, width=10, 
+                                    values=("60 分钟", "180 分钟", "720 分钟", "1440 分钟"), 
+                                    state='readonly')
+        window_combo.pack(side='left', padx=5)
+        window_combo.bind('<<ComboboxSelected>>', lambda e: self.draw_stats())
+        
+        ttk.Button(control_frame, text="从日志目录加载", 
+                  command=self.load_time_series).pack(side='left', padx=5)
+        
+        self.stats_summary_var = tk.StringVar(value="启动监控或从日志目录加载后显示统计")
+        ttk.Label(control_frame, textvariable=self.stats_summary_var).pack(side='left', padx=10)
+        
+        self.stats_canvas = tk.Canvas(tab, background='white', highlightthickness=0)
+        self.stats_canvas.pack(fill='both', expand=True, padx=10, pady=5)
+        self.stats_canvas.bind('<Configure>', lambda e: self.draw_stats())
+    
+    def load_time_series(self):
+        """在后台读取日志目录中的 latest.log 与最近的归档，重建统计"""
+        log_dir = self._primary_log_dir()
+        if not os.path.isdir(log_dir):
+            messagebox.showerror("错误", f"日志目录不存在: {log_dir}")
+            return
+        if self._submit_job('time_series', LogTimeSeries.from_directory, log_dir, 
+                            on_done=self._on_time_series_loaded):
+            self.status_var.set("正在读取日志统计...")
+    
+    def _on_time_series_loaded(self, future):
+        try:
+            self.time_series = future.result()
+        except Exception as e:
+            self._show_error(f"读取日志统计失败: {e}")
+            return
+        self.status_var.set("日志统计已更新")
+        self.draw_stats()
+    
+    def draw_stats(self):
+        """把最近的统计画成折线图，每个指标组一行"""
+        canvas = self.stats_canvas
+        canvas.delete('all')
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        minutes = int(self.stats_window_var.get().split()[0])
+        start, data = self.time_series.tail(minutes)
+        if width < 100 or height < 100 or not data['errors']:
+            return
+        
+        count = len(data['errors'])
+        self.stats_summary_var.set(
+            f"{datetime.fromtimestamp(start * 60):%m-%d %H:%M} 起 {count} 分钟: "
+            f"错误 {sum(data['errors'])}，警告 {sum(data['warns'])}，"
+            f"卡顿 {sum(data['lag_events'])} 次，加入 {sum(data['joins'])}，离开 {sum(data['leaves'])}")
+        
+        left, right, top, bottom = 60, width - 10, 5, height - 16
+        panel_height = (bottom - top) / len(self.STATS_PANELS)
+        step = (right - left) / max(count - 1, 1)
+        for row, (title, series) in enumerate(self.STATS_PANELS):
+            y0 = top + row * panel_height + 18
+            y1 = top + (row + 1) * panel_height - 8
+            peak = max(max(data[name]) for name, color in series) or 1
+            canvas.create_rectangle(left, y0, right, y1, outline='#cccccc')
+            canvas.create_text(left, y0 - 2, text=title, anchor='sw')
+            canvas.create_text(left - 4, y0, text=str(peak), anchor='ne', fill='#666666')
+            canvas.create_text(left - 4, y1, text="0", anchor='se', fill='#666666')
+            for name, color in series:
+                points = []
+                for i, value in enumerate(data[name]):
+                    points.extend((left + i * step, y1 - (y1 - y0) * value / peak))
+                if count == 1:
+                    points.extend((right, points[1]))
+                canvas.create_line(*points, fill=color)
+        
+        # 时间轴：首尾两个时间点
+        canvas.create_text(left, height - 2, text=f"{datetime.fromtimestamp(start * 60):%H:%M}", 
+                           anchor='sw', fill='#666666')
+        end = start + count - 1
+        canvas.create_text(right, height - 2, text=f"{datetime.fromtimestamp(end * 60):%H:%M}", 
+                           anchor='se', fill='#666666')
+    
+    def create_perf_tab(self, notebook):
+        """创建性能标签页：实时显示热点路径的耗时、计数与队列深度"""
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text="性能")
+        
+        ttk.Label(tab, text="运行指标", 
+                 font=('Arial', 12, 'bold')).pack(pady=10)
+        
+        timer_frame = ttk.LabelFrame(tab, text="耗时", padding=10)
+        timer_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        columns = ('name', 'count', 'p50', 'p95', 'max', 'total')
+        self.timer_tree = ttk.Treeview(timer_frame, columns=columns, 
+                                       show='headings', height=10)
+        for column, heading, width in zip(columns, 
+                                          ("名称", "次数", "p50(ms)", "p95(ms)", "最大(ms)", "总计(s)"), 
+                                          (220, 80, 90, 90, 90, 90)):
+            self.timer_tree.heading(column, text=heading)
+            self.timer_tree.column(column, width=width, stretch=(column == 'name'))
+        self.timer_tree.pack(fill='both', expand=True)
+        
+        value_frame = ttk.LabelFrame(tab, text="计数与队列", padding=10)
+        value_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        self.value_tree = ttk.Treeview(value_frame, columns=('name', 'value'), 
+                                       show='headings', height=8)
+        for column, heading, width in (('name', "名称", 300), ('value', "值", 150)):
+            self.value_tree.heading(column, text=heading)
+            self.value_tree.column(column, width=width, stretch=(column == 'name'))
+        self.value_tree.pack(fill='both', expand=True)
+        
+        button_frame = ttk.Frame(tab)
+        button_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Button(button_frame, text="重置", 
+                  command=self.reset_metrics).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="导出指标文件", 
+                  command=self.export_metrics).pack(side='left', padx=5)
+        
+        self.root.after(1000, self.refresh_metrics)
+    
+    def refresh_metrics(self):
+        """每秒刷新一次性能页"""
+        metrics.gauge('monitor.queue', self.log_queue.qsize())
+        snapshot = metrics.snapshot()
+        
+        self.timer_tree.delete(*self.timer_tree.get_children())
+        for name, timer in sorted(snapshot['timers'].items()):
+            self.timer_tree.insert('', 'end', values=(
+                name, timer['count'], f"{timer['p50'] * 1000:.2f}", f"{timer['p95'] * 1000:.2f}", 
+                f"{timer['max'] * 1000:.2f}", f"{timer['total']:.3f}"))
+        
+        self.value_tree.delete(*self.value_tree.get_children())
+        values = dict(snapshot['counters'], **snapshot['gauges'])
+        for name, value in sorted(values.items()):
+            if '.bytes_' in name:
+                value = f"{value / (1024 * 1024):.2f} MB"
+            self.value_tree.insert('', 'end', values=(name, value))
+        
+        self.root.after(1000, self.refresh_metrics)
+    
+    def reset_metrics(self):
+        metrics.reset()
+        self.status_var.set("性能指标已重置")
+    
+    def export_metrics(self):
+        """把当前指标写入 JSON 文件（与命令行 --metrics-file 的格式相同）"""
+        file_path = filedialog.asksaveasfilename(
+            title="导出指标文件", 
+            defaultextension=".json", 
+            filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            metrics.dump(file_path)
+            self.status_var.set(f"指标已导出: {file_path}")
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {e}")
+    
     def create_config_tab(self, notebook):
         """创建配置标签页"""
         tab = ttk.Frame(notebook)
@@ -343,9 +860,17 @@ class MinecraftLogAnalyzerPro:
         custom_frame.pack(fill='x', pady=5)
         
         ttk.Label(custom_frame, text="自定义端点:").pack(side='left')
-        self.custom_api_var = tk.StringVar(value="https://api.mclo.gs/1")
+        self.custom_api_var = tk.StringVar(value=DEFAULT_API_BASE)
         ttk.Entry(custom_frame, textvariable=self.custom_api_var, 
                  width=40).pack(side='left', padx=5, fill='x', expand=True)
+        self.mock_button = ttk.Button(custom_frame, text="启动本地模拟服务器", 
+                                      command=self.toggle_mock_server)
+        self.mock_button.pack(side='left')
+        self.mock_server = None
+        
+        self.compress_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(api_frame, text="压缩上传 (gzip，端点不支持时自动改为不压缩)", 
+                       variable=self.compress_var).pack(anchor='w')
         
         # 显示设置
         display_frame = ttk.LabelFrame(tab, text="显示设置", padding=10)
@@ -406,6 +931,25 @@ class MinecraftLogAnalyzerPro:
         # 添加进度条
         self.progress = ttk.Progressbar(self.statusbar, mode='indeterminate', length=100)
         self.progress.pack(side='right', padx=5, pady=2)
+        
+        # 后台任务队列深度
+        self.queue_var = tk.StringVar()
+        ttk.Label(self.statusbar, textvariable=self.queue_var).pack(side='right', padx=5)
+    
+    def _show_queue_depth(self, depth):
+        self.queue_var.set(f"后台任务: {depth}" if depth else "")
+    
+    def _submit_job(self, key, fn, *args, on_done=None):
+        """提交后台任务，结果在界面线程中交给 on_done；队列已满时提示并返回 None"""
+        callback = None
+        if on_done is not None:
+            callback = lambda f: self.root.after(0, on_done, f)
+        try:
+            return self.jobs.submit(key, fn, *args, on_done=callback)
+        except JobQueueFull:
+            self.progress.stop()
+            self.status_var.set("后台任务过多，请稍后再试")
+            return None
     
     def create_syntax_text(self, parent):
         """创建支持语法高亮的文本框"""
@@ -417,11 +961,43 @@ class MinecraftLogAnalyzerPro:
         text.tag_config('INFO', foreground='blue')
         text.tag_config('DEBUG', foreground='gray')
         text.tag_config('TIMESTAMP', foreground='green')
+        text.tag_config('SEARCH', background='yellow')
         
         return text
     
+    def on_text_edited(self, event):
+        """按键编辑后重新高亮光标附近的行"""
+        if event.char:
+            # Ctrl+C、Ctrl+A 等快捷键也带控制字符，只有输入字符和编辑键才算用户编辑（剪切见 <<Cut>>）
+            if not event.state & 0x4 and (event.char >= ' ' or event.keysym in ('BackSpace', 'Return', 'Tab')):
+                self._user_edited = True
+            self._reset_log_records()
+        if self.syntax_highlight.get():
+            line = int(self.log_text.index('insert').split('.')[0])
+            self.highlighter.highlight_lines(max(line - 1, 1), line + 1)
+    
+    def on_text_pasted(self, event):
+        """粘贴后重新高亮粘贴进来的行"""
+        self._user_edited = True
+        self._reset_log_records()
+        if self.syntax_highlight.get():
+            first = int(self.log_text.index('insert').split('.')[0])
+            self.root.after_idle(self._highlight_pasted, first)
+    
+    def on_text_cut(self, event):
+        self._user_edited = True
+        self._reset_log_records()
+    
+    def _highlight_pasted(self, first):
+        last = int(self.log_text.index('insert').split('.')[0])
+        self.highlighter.highlight_lines(first, max(first, last))
+    
     def on_text_modified(self, event):
         """文本修改事件处理"""
+        # 复位修改标志后 <<Modified>> 才会再次触发（复位本身也会触发一次）
+        if not self.log_text.edit_modified():
+            return
+        self.log_text.edit_modified(False)
         if self.auto_analyze.get():
             self.schedule_analysis()
     
@@ -435,38 +1011,101 @@ class MinecraftLogAnalyzerPro:
         self._analysis_job = self.root.after(1000, self.perform_auto_analysis)
     
     def perform_auto_analysis(self):
-        """执行自动分析"""
+        """执行自动分析：本地立即增量分析，用户编辑的内容等编辑停止后再重新上传"""
+        content = self.log_text.get('1.0', 'end-1c')
+        user_edited, self._user_edited = self._user_edited, False
+        if len(content.strip()) > 100:  # 内容足够长才分析
+            self.run_local_analysis(content)
+            if user_edited:
+                self._schedule_reupload()
+    
+    def _schedule_reupload(self):
+        if self._reupload_job:
+            self.root.after_cancel(self._reupload_job)
+        self._reupload_job = self.root.after(self.reupload_delay, self._reupload_if_changed)
+    
+    def _reupload_if_changed(self):
+        """编辑已停止：内容与上次上传的不同时才重新上传"""
+        self._reupload_job = None
         content = self.log_text.get('1.0', 'end-1c').strip()
-        if len(content) > 100:  # 内容足够长才分析
-            self.analyze_log_content(content)
+        if len(content) > 100 and content != self._uploaded_content:
+            self.upload_for_analysis(content)
     
     def analyze_log_content(self, content):
         """分析日志内容"""
+        self.run_local_analysis(content)
+        self.upload_for_analysis(content)
+    
+    def upload_for_analysis(self, content):
+        """上传到 mclo.gs 进行远程分析"""
+        if self._reupload_job:
+            self.root.after_cancel(self._reupload_job)
+            self._reupload_job = None
+        self._uploaded_content = content.strip()
+        
         self.status_var.set("正在分析...")
         self.progress.start()
+        self._sync_api_client()
         
-        thread = threading.Thread(target=self._analyze_thread, args=(content,))
-        thread.daemon = True
-        thread.start()
+        # 调用API分析（相同内容已上传过时直接使用缓存结果）；新的分析取代尚未完成的旧分析
+        self._submit_job('analyze', self.uploader.upload_digest, content, on_done=self._on_analysis_done)
     
-    def _analyze_thread(self, content):
-        """分析线程"""
-        try:
-            # 调用API分析
-            data = {'content': content}
-            response = requests.post(self.api_url, data=data, timeout=self.timeout_var.get())
-            
-            if response.status_code == 200:
-                result = response.json()
-                self.root.after(0, self._handle_analysis_result, result)
-            else:
-                self.root.after(0, self._show_error, f"API错误: {response.status_code}")
-                
-        except Exception as e:
-            self.root.after(0, self._show_error, str(e))
+    def _on_analysis_done(self, future, cluster_key=None, source_path=None):
+        if not future.exception() and cluster_key is not None:
+            self.crash_clusters.record_upload(cluster_key, source_path, future.result()[1])
+            self.crash_clusters.save()
+        if not self.jobs.is_current('analyze', future):
+            return
+        if future.exception():
+            self._show_error(str(future.exception()))
+        else:
+            digest, result = future.result()
+            self._handle_analysis_result(result, digest)
+    
+    def run_local_analysis(self, content):
+        """在后台任务队列中执行本地离线分析（内容未变的块直接复用上次的结果）"""
+        loader = self.loader_var.get()
+        if self.incremental_analyzer is None or self.incremental_analyzer.loader != loader:
+            self.incremental_analyzer = IncrementalAnalyzer(loader)
+        self._submit_job('local', self.incremental_analyzer.update, content,
+                         on_done=self._show_local_problems)
     
-    def _handle_analysis_result(self, result):
-        """处理分析结果"""
+    def run_local_analysis_files(self, paths):
+        """在后台任务队列中流式分析日志文件（不经过文本框，逐行读取一次）"""
+        analyzer = LocalAnalyzer(self.loader_var.get())
+        self._submit_job('local', self._analyze_files, analyzer, paths, on_done=self._show_local_problems)
+    
+    @staticmethod
+    def _analyze_files(analyzer, paths):
+        # 与 IncrementalAnalyzer.update 的返回值格式一致：(问题列表, 重新分析的块数, 总块数)
+        return analyzer.analyze_lines(iter_logs_lines(paths)), None, None
+    
+    def _show_local_problems(self, future):
+        """显示本地分析结果（只显示最近一次分析）"""
+        if not self.jobs.is_current('local', future) or future.exception():
+            return
+        
+        self.problem_tree.delete(*self.problem_tree.get_children())
+        labels = {'oom': "内存不足", 'dependency': "依赖错误", 
+                  'exception': "异常", 'tick_lag': "卡顿"}
+        problems = future.result()[0]
+        for problem in problems:
+            message = problem['message']
+            if 'max_lag_ms' in problem:
+                message += f"，最长落后 {problem['max_lag_ms']} ms"
+            self.problem_tree.insert('', 'end', values=(
+                labels[problem['type']], message, problem['line'], problem['count']))
+    
+    def on_problem_selected(self, event):
+        """双击问题时跳转到对应行"""
+        selection = self.problem_tree.selection()
+        if selection:
+            line = self.problem_tree.item(selection[0], 'values')[2]
+            self.log_text.see(f"{line}.0")
+            self.log_text.mark_set('insert', f"{line}.0")
+    
+    def _handle_analysis_result(self, result, digest=None):
+        """处理上传结果，随后在后台获取 mclo.gs 的分析结果"""
         self.progress.stop()
         
         if result.get('success'):
@@ -479,19 +1118,66 @@ class MinecraftLogAnalyzerPro:
             self.raw_link_text.insert('1.0', json.dumps(result, indent=2))
             
             # 显示分析结果
-            self.show_analysis_results(result)
+            self.show_analysis_results(result, digest)
             self.status_var.set("分析完成")
         else:
             self.status_var.set("分析失败")
     
-    def show_analysis_results(self, result):
-        """显示分析结果"""
-        # 这里可以创建一个新的结果窗口或更新现有显示
-        # 由于篇幅限制，这里简化为显示通知
-        insights = result.get('insights', {})
+    def show_analysis_results(self, result, digest=None):
+        """在结果面板中显示 mclo.gs 的分析结果：命中缓存时立即显示，否则在后台获取"""
+        log_id = result['id']
+        self._insights_log_id = log_id
+        insights = self.insights.cached(log_id, digest)
+        if insights is not None:
+            self._render_insights(log_id, insights)
+            return
         
-        if 'analysis' in insights:
-            messagebox.showinfo("分析结果", insights['analysis'])
+        self.insights_title_var.set(f"正在获取 {log_id} 的分析结果...")
+        self.insights_tree.delete(*self.insights_tree.get_children())
+        self._submit_job('insights', self.insights.fetch, log_id, digest,
+                         on_done=lambda future: self._on_insights_done(future, log_id))
+    
+    def _on_insights_done(self, future, log_id):
+        # 只显示当前日志的结果（期间可能已切换到其他日志）
+        if not self.jobs.is_current('insights', future) or log_id != self._insights_log_id:
+            return
+        if future.exception():
+            self.insights_title_var.set(f"获取分析结果失败: {future.exception()}")
+        else:
+            self._render_insights(log_id, future.result())
+    
+    def _render_insights(self, log_id, insights):
+        tree = self.insights_tree
+        tree.delete(*tree.get_children())
+        title = insights.get('title') or log_id
+        detail = " ".join(str(part) for part in (insights.get('type'), insights.get('version')) if part)
+        problems = InsightsFetcher.problems(insights)
+        self.insights_title_var.set(f"{title} ({detail}) - 发现 {len(problems)} 个问题" if detail 
+                                    else f"{title} - 发现 {len(problems)} 个问题")
+        
+        for message, count, line, solutions in problems:
+            item = tree.insert('', 'end', text=message, values=("", line or "", count), open=True)
+            for solution in solutions:
+                tree.insert(item, 'end', text=f"解决方案: {solution}")
+        information = InsightsFetcher.information(insights)
+        if information:
+            group = tree.insert('', 'end', text="信息", open=not problems)
+            for label, value in information:
+                tree.insert(group, 'end', text=label, values=(value, "", ""))
+        if problems:
+            self.result_notebook.select(self.insights_frame)
+    
+    def open_shared_log(self):
+        """打开分享链接（或日志ID）对应的分析结果（已获取过的直接从缓存显示）"""
+        link = self.share_link_var.get().strip().rstrip('/')
+        log_id = link.rsplit('/', 1)[-1]
+        if not log_id:
+            messagebox.showwarning("警告", "请先输入分享链接")
+            return
+        self.current_log_id = log_id
+        self.current_log_url = link if '/' in link else f"https://mclo.gs/{log_id}"
+        self.show_analysis_results({'id': log_id})
+        self.status_var.set(f"已打开分享的日志 {log_id}，分析结果显示在日志分析页")
     
     def generate_share_link(self):
         """生成分享链接"""
@@ -530,42 +1216,80 @@ class MinecraftLogAnalyzerPro:
         self.monitor_thread = threading.Thread(target=self._monitor_logs)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
+        
+        # 在主线程中消费监控线程推送的新日志行
+        self.root.after(200, self._drain_log_queue)
     
     def _monitor_logs(self):
-        """监控日志文件（模拟）"""
-        import time
-        last_content = ""
-        
+        """监控日志文件（由文件事件驱动，所有服务器共用一个线程，监控关闭时线程挂起）"""
         while True:
-            if self.monitoring:
-                try:
-                    # 模拟检查日志文件
-                    log_path = os.path.join(self.log_dir_var.get(), "latest.log")
-                    if os.path.exists(log_path):
-                        with open(log_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        # 检查是否有新内容
-                        if content != last_content and len(content) > len(last_content):
-                            new_content = content[len(last_content):]
-                            self.root.after(0, self._add_monitor_log, 
-                                          f"检测到新日志内容 ({len(new_content)} 字符)")
-                            last_content = content
-                    
-                except Exception as e:
-                    self.root.after(0, self._add_monitor_log, f"监控错误: {e}")
-            
-            time.sleep(5)  # 每5秒检查一次
+            monitor = self.monitor_requests.get()
+            monitor.run(on_error=lambda server, e: self._add_monitor_log(f"[{server}] 监控错误: {e}"))
+    
+    def _start_fleet_monitor(self):
+        """在界面线程中按当前日志目录创建监控器，交给监控线程运行"""
+        self.log_monitor = FleetMonitor(
+            self.log_dir_var.get(),
+            lambda server, lines: self.log_queue.put((server, lines)),
+            lambda server, path: self.root.after(0, self._on_crash_detected, path, server),
+            on_event=self._on_dir_event)
+        self.monitor_requests.put(self.log_monitor)
+    
+    def _stop_fleet_monitor(self):
+        if self.log_monitor:
+            self.log_monitor.stop()
+            self.log_monitor = None
+    
+    def _on_crash_detected(self, crash_file, server):
+        """监控到新的崩溃报告时自动上传"""
+        self.add_monitor_log(f"[{server}] 检测到崩溃报告: {os.path.basename(crash_file)}")
+        self._upload_crash_file(crash_file)
+    
+    def _schedule_monitor_restart(self, *args):
+        if self._log_dir_job:
+            self.root.after_cancel(self._log_dir_job)
+        self._log_dir_job = self.root.after(1500, self._restart_log_monitor)
+    
+    def _restart_log_monitor(self, event=None):
+        """日志目录变化时重新开始监控（目录未变时不重建）"""
+        if self._log_dir_job:
+            self.root.after_cancel(self._log_dir_job)
+            self._log_dir_job = None
+        if not self.monitoring or (self.log_monitor and self.log_monitor.log_dirs == self.log_dir_var.get()):
+            return
+        self._stop_fleet_monitor()
+        self._start_fleet_monitor()
+    
+    def _drain_log_queue(self):
+        """处理监控线程推送的新日志行（统计页汇总所有服务器）"""
+        counts = {}
+        try:
+            while True:
+                server, lines = self.log_queue.get_nowait()
+                counts[server] = counts.get(server, 0) + len(lines)
+                self.time_series.feed(lines)
+        except queue.Empty:
+            pass
+        
+        if counts:
+            # 服务器很多时每次只输出一行汇总
+            summary = "，".join(f"[{server}] {count} 行" for server, count in sorted(counts.items()))
+            self.add_monitor_log(f"检测到新日志内容: {summary}")
+            self.draw_stats()
+        
+        self.root.after(200, self._drain_log_queue)
     
     def toggle_monitoring(self):
         """切换监控状态"""
         self.monitoring = not self.monitoring
         
         if self.monitoring:
+            self._start_fleet_monitor()
             self.monitor_btn.config(text="停止监控")
             self.add_monitor_log("日志监控已启动")
             self.status_var.set("正在监控日志文件")
         else:
+            self._stop_fleet_monitor()
             self.monitor_btn.config(text="启动监控")
             self.add_monitor_log("日志监控已停止")
             self.status_var.set("监控已停止")
@@ -585,27 +1309,64 @@ class MinecraftLogAnalyzerPro:
         directory = filedialog.askdirectory(title="选择日志目录")
         if directory:
             self.log_dir_var.set(directory)
+            self._restart_log_monitor()
+    
+    def _primary_log_dir(self):
+        """日志目录配置了多个服务器时，单服务器的操作使用第一个"""
+        log_dirs = expand_log_dirs(self.log_dir_var.get())
+        return log_dirs[0] if log_dirs else self.log_dir_var.get()
     
     def upload_latest_log(self):
         """上传最新日志"""
-        log_path = os.path.join(self.log_dir_var.get(), "latest.log")
+        log_path = os.path.join(self._primary_log_dir(), "latest.log")
         if os.path.exists(log_path):
             try:
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                self.log_text.delete('1.0', 'end')
-                self.log_text.insert('1.0', content)
+                # 显示与上传都流式进行，大日志按页显示，不整体读入内存
+                self.load_log_files([log_path])
                 self.add_monitor_log(f"已加载日志: {log_path}")
                 
                 if self.auto_analyze.get():
-                    self.analyze_log_content(content)
+                    self.run_local_analysis_files([log_path])
+                    self.upload_log_files([log_path])
                     
             except Exception as e:
                 messagebox.showerror("错误", f"读取日志失败: {e}")
         else:
             messagebox.showwarning("警告", f"找不到日志文件: {log_path}")
     
+    def batch_upload_directory(self):
+        """批量上传目录中的所有日志（包括 .log.gz 归档）"""
+        directory = filedialog.askdirectory(title="选择要批量上传的目录", 
+                                            initialdir=self._primary_log_dir())
+        if not directory:
+            return
+        
+        self._sync_api_client()
+        uploader = BatchUploader(self.uploader, clusters=self.crash_clusters)
+        self.add_monitor_log(f"开始批量上传: {directory}")
+        self.status_var.set("正在批量上传...")
+        self.progress.start()
+        self._submit_job(None, self._run_batch_upload, uploader, directory)
+    
+    def _run_batch_upload(self, uploader, directory):
+        """批量上传任务（在后台任务队列中执行）"""
+        def progress(done, total, rel, entry):
+            status = entry.get('url') or f"失败: {entry.get('error')}"
+            if 'duplicate_of' in entry:
+                status += f" (与 {entry['duplicate_of']} 同类)"
+            self._add_monitor_log(f"[{done}/{total}] {rel} -> {status}")
+        
+        try:
+            manifest_path, succeeded, failed, skipped = uploader.run(directory, progress)
+        except Exception as e:
+            self.root.after(0, self._show_error, f"批量上传失败: {e}")
+            return
+        
+        summary = f"批量上传完成: 成功 {succeeded}，失败 {failed}，跳过 {skipped}"
+        self._add_monitor_log(f"{summary}，清单: {manifest_path}")
+        self.root.after(0, self.progress.stop)
+        self.root.after(0, self.status_var.set, summary)
+    
     def browse_game_dir(self):
         """浏览游戏目录"""
         directory = filedialog.askdirectory(title="选择Minecraft游戏目录")
@@ -625,11 +1386,7 @@ class MinecraftLogAnalyzerPro:
                 latest_log = self._find_latest_log(log_dir)
                 if latest_log:
                     try:
-                        with open(latest_log, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        self.client_log_text.delete('1.0', 'end')
-                        self.client_log_text.insert('1.0', content)
+                        self.client_log_view.open(latest_log)
                         self.status_var.set(f"已捕获日志: {os.path.basename(latest_log)}")
                         return
                         
@@ -639,14 +1396,21 @@ class MinecraftLogAnalyzerPro:
         messagebox.showinfo("提示", "未找到客户端日志文件")
     
     def _find_latest_log(self, directory):
-        """查找最新的日志文件"""
-        import glob
-        log_files = glob.glob(os.path.join(directory, "*.log")) + \
-                   glob.glob(os.path.join(directory, "*.txt"))
-        
-        if log_files:
-            return max(log_files, key=os.path.getmtime)
-        return None
+        """查找最新的日志文件（.log/.txt，查询走缓存的目录索引）"""
+        return self._dir_index(directory).latest(('.log', '.txt'))
+    
+    def _dir_index(self, directory):
+        key = os.path.abspath(directory)
+        index = self.dir_indexes.get(key)
+        if index is None:
+            index = self.dir_indexes[key] = LogDirectoryIndex(key)
+        return index
+    
+    def _on_dir_event(self, directory, name, kind):
+        """监控线程收到文件事件时更新对应的目录索引"""
+        index = self.dir_indexes.get(os.path.abspath(directory))
+        if index is not None:
+            index.update(name)
     
     def upload_crash_report(self):
         """上传崩溃报告"""
@@ -654,40 +1418,101 @@ class MinecraftLogAnalyzerPro:
         if os.path.exists(crash_dir):
             crash_file = self._find_latest_log(crash_dir)
             if crash_file:
-                try:
-                    with open(crash_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # 自动上传到分析
-                    self.log_text.delete('1.0', 'end')
-                    self.log_text.insert('1.0', content)
-                    self.analyze_log_content(content)
-                    
-                    self.status_var.set(f"已上传崩溃报告: {os.path.basename(crash_file)}")
-                    
-                except Exception as e:
-                    messagebox.showerror("错误", f"读取崩溃报告失败: {e}")
+                self._upload_crash_file(crash_file)
             else:
                 messagebox.showinfo("提示", "未找到崩溃报告")
         else:
             messagebox.showinfo("提示", "未找到崩溃报告目录")
     
+    def _upload_crash_file(self, crash_file):
+        """载入并上传指定的崩溃报告"""
+        try:
+            self.load_log_files([crash_file])
+            
+            # 同类崩溃已上传过时直接复用其链接，只做本地分析
+            key, cluster = self.crash_clusters.add_file(crash_file)
+            self.crash_clusters.save()
+            name = os.path.basename(crash_file)
+            self.run_local_analysis_files([crash_file])
+            if cluster and 'url' in cluster:
+                self._handle_analysis_result({'success': True, 'id': cluster['id'], 'url': cluster['url'],
+                                              'cluster': {'title': cluster['title'], 'count': cluster['count'],
+                                                          'representative': cluster['representative']}})
+                self.add_monitor_log(f"{name} 与已上传的同类崩溃相同（第 {cluster['count']} 次）: {cluster['url']}")
+                self.status_var.set(f"同类崩溃已上传过: {name}")
+                return
+            
+            # 自动上传到分析
+            self.upload_log_files([crash_file], cluster_key=key)
+            self.status_var.set(f"已上传崩溃报告: {name}")
+            
+        except Exception as e:
+            messagebox.showerror("错误", f"读取崩溃报告失败: {e}")
+    
     def view_latest_client_log(self):
         """查看最新客户端日志"""
         log_file = self._find_latest_log(os.path.join(self.game_dir_var.get(), "logs"))
         if log_file:
             try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
                 # 在新窗口中显示
-                self.show_log_viewer("客户端日志", content, log_file)
+                self.show_log_viewer("客户端日志", log_file)
                 
             except Exception as e:
                 messagebox.showerror("错误", f"打开日志失败: {e}")
         else:
             messagebox.showinfo("提示", "未找到日志文件")
     
+    def view_client_log_history(self):
+        """在查看器中打开客户端一段日期内的归档（拼接为一个日志）"""
+        paths = self._ask_log_history(os.path.join(self.game_dir_var.get(), "logs"))
+        if paths:
+            self.show_log_viewer("客户端历史日志", paths)
+    
+    def open_log_history(self):
+        """把服务器一段日期内的归档拼接后载入分析页（可搜索、分析与上传）"""
+        paths = self._ask_log_history(self._primary_log_dir())
+        if paths:
+            try:
+                self.load_log_files(paths)
+            except Exception as e:
+                messagebox.showerror("错误", f"无法读取文件: {e}")
+    
+    def _ask_log_history(self, log_dir):
+        """询问日期范围，返回范围内按时间顺序的归档（及今天的 latest.log），取消或没有文件时返回 None"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("选择日期范围")
+        dialog.transient(self.root)
+        
+        today = datetime.now()
+        first_var = tk.StringVar(value=(today - timedelta(days=7)).strftime('%Y-%m-%d'))
+        last_var = tk.StringVar(value=today.strftime('%Y-%m-%d'))
+        for row, (label, var) in enumerate((("开始日期:", first_var), ("结束日期:", last_var))):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, padx=10, pady=5, sticky='w')
+            ttk.Entry(dialog, textvariable=var, width=12).grid(row=row, column=1, padx=10, pady=5)
+        
+        result = []
+        
+        def confirm():
+            result.append((first_var.get().strip(), last_var.get().strip()))
+            dialog.destroy()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Button(button_frame, text="确定", command=confirm).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side='left', padx=5)
+        dialog.grab_set()
+        self.root.wait_window(dialog)
+        if not result:
+            return None
+        
+        first, last = result[0]
+        paths = self._dir_index(log_dir).history(first or None, last or None)
+        if not paths:
+            messagebox.showinfo("提示", f"{first} 至 {last} 没有日志文件")
+            return None
+        self.status_var.set(f"{first} 至 {last} 共 {len(paths)} 个日志文件")
+        return paths
+    
     def send_api_request(self):
         """发送API请求"""
         endpoint = self.api_endpoint_var.get()
@@ -699,32 +1524,41 @@ class MinecraftLogAnalyzerPro:
             messagebox.showerror("错误", "无效的JSON格式")
             return
         
+        self._sync_api_client()
         url = f"{self.api_base}{endpoint}"
         
         # 如果是需要日志ID的端点
-        if '{id}' in endpoint and self.current_log_id:
+        if '{id}' in endpoint:
+            if not self.current_log_id:
+                messagebox.showwarning("警告", "请先上传日志以获得日志ID")
+                return
             url = url.replace('{id}', self.current_log_id)
         
+        # 上传为表单POST，其余端点为GET
+        method = 'POST' if endpoint.rstrip('/') == '/log' else 'GET'
+        
         self.status_var.set("正在发送API请求...")
         self.progress.start()
-        
-        thread = threading.Thread(target=self._api_request_thread, args=(url, params))
-        thread.daemon = True
-        thread.start()
+        self._submit_job('api', self._run_api_request, method, url, params,
+                         on_done=self._on_api_done)
     
-    def _api_request_thread(self, url, params):
-        """API请求线程"""
+    def _run_api_request(self, method, url, params):
+        """API请求任务（在后台任务队列中执行），返回 (响应, 耗时)"""
         import time
         start_time = time.time()
-        
-        try:
-            response = requests.post(url, json=params, timeout=self.timeout_var.get())
-            response_time = time.time() - start_time
-            
-            self.root.after(0, self._handle_api_response, response, response_time)
-                
-        except Exception as e:
-            self.root.after(0, self._show_error, f"API请求失败: {e}")
+        if method == 'POST':
+            response = self.api.request('POST', url, data=params)
+        else:
+            response = self.api.request('GET', url)
+        return response, time.time() - start_time
+    
+    def _on_api_done(self, future):
+        if not self.jobs.is_current('api', future):
+            return
+        if future.exception():
+            self._show_error(f"API请求失败: {future.exception()}")
+        else:
+            self._handle_api_response(*future.result())
     
     def _handle_api_response(self, response, response_time):
         """处理API响应"""
@@ -748,6 +1582,23 @@ class MinecraftLogAnalyzerPro:
         
         self.status_var.set("API请求完成")
     
+    def toggle_mock_server(self):
+        """启动/停止本地模拟 mclo.gs 服务器，并将自定义端点指向它"""
+        if self.mock_server:
+            self.mock_server.stop()
+            self.mock_server = None
+            self.custom_api_var.set(DEFAULT_API_BASE)
+            self.mock_button.config(text="启动本地模拟服务器")
+            self.status_var.set("本地模拟服务器已停止")
+            return
+        
+        from mclogs_mock import MockMclogsServer  # 开发用，只在启动时才导入
+        
+        self.mock_server = MockMclogsServer().start()
+        self.custom_api_var.set(self.mock_server.api_base)
+        self.mock_button.config(text="停止模拟服务器")
+        self.status_var.set(f"本地模拟服务器已启动: {self.mock_server.api_base}")
+    
     def save_api_key(self):
         """保存API密钥"""
         api_key = self.api_key_var.get()
@@ -762,56 +1613,204 @@ class MinecraftLogAnalyzerPro:
         """重置所有设置"""
         if messagebox.askyesno("确认", "确定要重置所有设置吗？"):
             self.api_key_var.set("")
-            self.custom_api_var.set("https://api.mclo.gs/1")
+            self.custom_api_var.set(DEFAULT_API_BASE)
             self.timeout_var.set(30)
             self.status_var.set("设置已重置")
     
     def open_log_file(self):
-        """打开日志文件"""
-        file_path = filedialog.askopenfilename(
+        """打开日志文件（选择多个时按文件名顺序拼接，轮转归档的文件名即时间顺序）"""
+        file_paths = filedialog.askopenfilenames(
             title="选择日志文件",
             filetypes=[
                 ("日志文件", "*.log"),
+                ("日志归档", "*.log.gz"),
                 ("崩溃报告", "*.txt"),
                 ("所有文件", "*.*")
             ]
         )
         
-        if file_path:
+        if file_paths:
             try:
-                # 尝试多种编码
-                encodings = ['utf-8', 'latin-1', 'cp1252']
-                content = None
-                
-                for encoding in encodings:
-                    try:
-                        with open(file_path, 'r', encoding=encoding) as f:
-                            content = f.read()
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                
-                if content is None:
-                    # 二进制方式读取
-                    with open(file_path, 'rb') as f:
-                        content = f.read().decode('utf-8', errors='ignore')
-                
-                self.log_text.delete('1.0', 'end')
-                self.log_text.insert('1.0', content)
-                self.status_var.set(f"已加载: {os.path.basename(file_path)}")
-                
-                # 应用语法高亮
-                if self.syntax_highlight.get():
-                    self.apply_syntax_highlight()
-                
+                self.load_log_files(sorted(file_paths))
             except Exception as e:
                 messagebox.showerror("错误", f"无法读取文件: {e}")
     
+    def load_log_files(self, file_paths):
+        """流式加载一个或多个日志文件（.gz 归档边读边解压，多个文件按顺序拼接）
+        
+        单个大文件按页打开；解压或拼接后过大的内容在虚拟化查看器中打开。
+        """
+        sizes = [GzipLineIndex.uncompressed_size(path) if path.endswith('.gz') else os.path.getsize(path)
+                 for path in file_paths]
+        if sum(sizes) > LARGE_FILE_THRESHOLD:
+            if len(file_paths) == 1 and not file_paths[0].endswith('.gz'):
+                self._set_paged_file(PagedFile(file_paths[0], detect_encoding(file_paths[0])))
+                self.show_page(0)
+            else:
+                self.show_log_viewer("日志", file_paths)
+            return
+        
+        self._set_paged_file(None)
+        self.log_text.delete('1.0', 'end')
+        self.progress.stop()
+        size = sum(os.path.getsize(path) for path in file_paths)
+        self.progress.config(mode='determinate', maximum=max(size, 1), value=0)
+        
+        name = os.path.basename(file_paths[0])
+        if len(file_paths) > 1:
+            name += f" 等 {len(file_paths)} 个文件"
+        self._load_chunks = iter_log_chunks(file_paths)
+        self._load_job = self.root.after(0, self._load_next_chunk, name, size)
+    
+    def _load_next_chunk(self, name, size):
+        """写入下一块内容，并更新进度条"""
+        try:
+            chunk, done = next(self._load_chunks)
+        except StopIteration:
+            self._finish_file_load()
+            self.status_var.set(f"已加载: {name}")
+            
+            # 应用语法高亮
+            if self.syntax_highlight.get():
+                self.apply_syntax_highlight()
+            return
+        except Exception as e:
+            self._finish_file_load()
+            messagebox.showerror("错误", f"无法读取文件: {e}")
+            return
+        
+        self.log_text.insert('end-1c', chunk)
+        self.progress.config(value=done)
+        self.status_var.set(f"正在加载 {name} ({done * 100 // max(size, 1)}%)")
+        self._load_job = self.root.after(1, self._load_next_chunk, name, size)
+    
+    def _cancel_file_load(self):
+        """取消正在进行的文件加载"""
+        if getattr(self, '_load_job', None):
+            self.root.after_cancel(self._load_job)
+            self._load_chunks.close()
+            self._finish_file_load()
+    
+    def _finish_file_load(self):
+        self._load_job = None
+        self.progress.config(mode='indeterminate', value=0)
+    
+    def _set_paged_file(self, paged_file):
+        """进入或退出大文件分页模式（同时取消正在进行的加载）"""
+        self._cancel_file_load()
+        self.paged_file = paged_file
+        self.current_page = 0
+        self._set_search_source(path=paged_file.path if paged_file else None)
+        self._reset_log_records()
+        if paged_file:
+            self.page_frame.pack(fill='x', padx=10, pady=(0, 5), before=self.log_input_frame)
+        else:
+            self.page_frame.pack_forget()
+    
+    def show_page(self, index):
+        """在文本框中显示大文件的第 index 页"""
+        if not self.paged_file or index < 0:
+            return
+        if index > self.current_page and self.paged_file.is_last_page(self.current_page):
+            return
+        
+        try:
+            content = self.paged_file.read_page(index)
+        except Exception as e:
+            messagebox.showerror("错误", f"无法读取文件: {e}")
+            return
+        
+        self.current_page = index
+        self._reset_log_records()
+        self.log_text.delete('1.0', 'end')
+        self.log_text.insert('1.0', content)
+        
+        name = os.path.basename(self.paged_file.path)
+        self.page_var.set(f"第 {index + 1} / 约 {self.paged_file.page_count} 页")
+        self.status_var.set(f"已分页加载: {name}")
+        
+        if self.syntax_highlight.get():
+            self.apply_syntax_highlight()
+    
+    def _set_search_source(self, path=None, content=None, records=None):
+        """切换搜索对象：大文件使用持久化索引，文本框内容使用内存索引"""
+        if self._search_index:
+            old = self._search_index
+            self.search_pool.submit(lambda: old.result().close())
+        if path:
+            self._search_index = self.search_pool.submit(SearchIndex.open, path)
+        elif content is not None:
+            self._search_index = self.search_pool.submit(
+                lambda: SearchIndex.from_text(content, records.result() if records else None))
+        else:
+            self._search_index = None
+        self._search_text = content
+        self._search_future = None
+        self.search_hits = []
+        self.search_pos = -1
+        self.search_result_var.set("")
+    
+    def run_search(self):
+        """在搜索线程中搜索当前日志（只显示最近一次搜索的结果）"""
+        query = self.search_var.get()
+        if not query.strip():
+            return
+        level = self.search_level_var.get()
+        level = None if level == "全部" else level
+        
+        if not self.paged_file:
+            content = self.log_text.get('1.0', 'end-1c')
+            if self._search_index is None or content != self._search_text:
+                records = self._records_future if content == self._records_text else None
+                self._set_search_source(content=content, records=records)
+        
+        index = self._search_index
+        self.search_result_var.set("正在搜索..." if index.done() else "正在建立索引...")
+        future = self.search_pool.submit(lambda: index.result().search(query, level))
+        self._search_future = future
+        future.add_done_callback(
+            lambda f: self.root.after(0, self._show_search_hits, f))
+    
+    def _show_search_hits(self, future):
+        if future is not self._search_future:
+            return
+        if future.exception():
+            self.search_result_var.set(f"搜索失败: {future.exception()}")
+            return
+        
+        self.search_hits = future.result()
+        self.search_pos = -1
+        if self.search_hits:
+            self.goto_search_hit(1)
+        else:
+            self.search_result_var.set("未找到")
+    
+    def goto_search_hit(self, step):
+        """跳转到上一个/下一个搜索结果（大文件自动翻到所在页）"""
+        if not self.search_hits:
+            return
+        self.search_pos = (self.search_pos + step) % len(self.search_hits)
+        line = self.search_hits[self.search_pos]
+        
+        if self.paged_file:
+            offset = self._search_index.result().lines.offset_of(line)
+            page, line = self.paged_file.locate(offset)
+            if page != self.current_page:
+                self.show_page(page)
+        
+        mark = f"{line + 1}.0"
+        self.log_text.tag_remove('SEARCH', '1.0', 'end')
+        self.log_text.tag_add('SEARCH', mark, f"{mark} lineend")
+        self.log_text.see(mark)
+        self.log_text.mark_set('insert', mark)
+        self.search_result_var.set(f"{self.search_pos + 1} / {len(self.search_hits)}")
+    
     def paste_from_clipboard(self):
         """从剪贴板粘贴"""
         try:
             content = pyperclip.paste()
             if content:
+                self._set_paged_file(None)
                 self.log_text.delete('1.0', 'end')
                 self.log_text.insert('1.0', content)
                 self.status_var.set("已从剪贴板粘贴")
@@ -824,8 +1823,9 @@ class MinecraftLogAnalyzerPro:
     def clear_all(self):
         """清空所有内容"""
         if messagebox.askyesno("确认", "确定要清空所有内容吗？"):
+            self._set_paged_file(None)
             self.log_text.delete('1.0', 'end')
-            self.client_log_text.delete('1.0', 'end')
+            self.client_log_view.close()
             self.monitor_log.delete('1.0', 'end')
             self.api_response_text.delete('1.0', 'end')
             self.api_params_text.delete('1.0', 'end')
@@ -835,54 +1835,76 @@ class MinecraftLogAnalyzerPro:
             self.current_log_url = None
             self.share_link_var.set("")
             self.raw_link_text.delete('1.0', 'end')
+            self._insights_log_id = None
+            self.insights_tree.delete(*self.insights_tree.get_children())
+            self.insights_title_var.set("")
             
             self.status_var.set("已清空")
     
     def apply_syntax_highlight(self):
-        """应用语法高亮"""
+        """应用语法高亮（可视区域立即处理，其余部分改用后台解析出的记录）"""
+        self._parse_log_records()
+        self.highlighter.highlight_all()
+    
+    def _parse_log_records(self):
+        """在线程池中将文本框内容解析为结构化记录"""
+        self._reset_log_records()
         content = self.log_text.get('1.0', 'end-1c')
-        lines = content.split('\n')
-        
-        # 清除现有标签
-        for tag in ['ERROR', 'WARN', 'INFO', 'DEBUG', 'TIMESTAMP']:
-            self.log_text.tag_remove(tag, '1.0', 'end')
-        
-        # 逐行分析
-        for i, line in enumerate(lines, 1):
-            start_idx = f"{i}.0"
-            
-            # 时间戳高亮
-            if line.startswith('[') and ']' in line:
-                end_bracket = line.find(']')
-                if end_bracket > 0:
-                    end_idx = f"{i}.{end_bracket + 1}"
-                    self.log_text.tag_add('TIMESTAMP', start_idx, end_idx)
-            
-            # 错误级别高亮
-            if '[ERROR]' in line.upper():
-                self.log_text.tag_add('ERROR', start_idx, f"{i}.end")
-            elif '[WARN]' in line.upper():
-                self.log_text.tag_add('WARN', start_idx, f"{i}.end")
-            elif '[INFO]' in line.upper():
-                self.log_text.tag_add('INFO', start_idx, f"{i}.end")
-            elif '[DEBUG]' in line.upper():
-                self.log_text.tag_add('DEBUG', start_idx, f"{i}.end")
-    
-    def show_log_viewer(self, title, content, filename=""):
-        """显示日志查看器窗口"""
+        self._records_future = self._submit_job('records', LogRecords.from_text, content,
+                                                on_done=self._use_log_records)
+        self._records_text = content if self._records_future else None
+    
+    def _use_log_records(self, future):
+        if future is self._records_future and not future.exception():
+            self.highlighter.records = future.result()
+    
+    def _reset_log_records(self):
+        """文本框内容改变后，已解析的记录不再可用"""
+        self._records_future = None
+        self._records_text = None
+        self.highlighter.records = None
+    
+    def show_log_viewer(self, title, filename):
+        """显示日志查看器窗口（虚拟化渲染，大文件、.gz 归档与多个拼接的文件也能立即打开）"""
+        paths = [filename] if isinstance(filename, str) else filename
         viewer = tk.Toplevel(self.root)
-        viewer.title(f"{title} - {filename}" if filename else title)
+        if len(paths) > 1:
+            viewer.title(f"{title} - {os.path.basename(paths[0])} 至 {os.path.basename(paths[-1])}")
+        else:
+            viewer.title(f"{title} - {paths[0]}")
         viewer.geometry("800x600")
         
-        # 添加文本控件
-        text = scrolledtext.ScrolledText(viewer, wrap='word')
-        text.pack(fill='both', expand=True, padx=10, pady=10)
-        text.insert('1.0', content)
-        text.config(state='normal')
+        # 添加虚拟化查看控件
+        view = VirtualLogView(viewer)
+        view.pack(fill='both', expand=True, padx=10, pady=10)
+        view.open(paths)
+        
+        # 关闭窗口时释放文件映射
+        def close():
+            view.close()
+            viewer.destroy()
+        
+        viewer.protocol('WM_DELETE_WINDOW', close)
+        
+        # 添加上传与关闭按钮
+        button_frame = ttk.Frame(viewer)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="上传", 
+                  command=lambda: self.upload_log_files(paths)).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="关闭", 
+                  command=close).pack(side='left', padx=5)
+    
+    def upload_log_files(self, paths, cluster_key=None):
+        """流式上传一个或多个日志文件（拼接为一个日志，.gz 归档边读边解压）
         
-        # 添加关闭按钮
-        ttk.Button(viewer, text="关闭", 
-                  command=viewer.destroy).pack(pady=5)
+        崩溃报告上传成功后记为 cluster_key 所属簇的代表。
+        """
+        self.status_var.set("正在上传...")
+        self.progress.start()
+        self._sync_api_client()
+        source = lambda: iter_logs_lines(paths)
+        self._submit_job('analyze', self.uploader.upload_digest, source,
+                         on_done=lambda future: self._on_analysis_done(future, cluster_key, paths[0]))
     
     def _show_error(self, message):
         """显示错误"""
@@ -0,0 +1,466 @@
+"""Minecraft 日志分析工具 - 基准测试
+
+生成指定大小的合成日志（混合级别、堆栈、Mod加载刷屏）与崩溃报告，分别测量各热点路径的耗时，
+结果以 JSON 输出，便于在版本之间对比性能变化。
+
+用法示例:
+    python mclogs_bench.py                                   # 10M、100M、1G 三种大小
+    python mclogs_bench.py --sizes 10M,100M --repeat 5 --output bench.json
+    python mclogs_bench.py --workdir /tmp/mclogs-bench --label v1.3
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from mclogs_core import (
+    LARGE_FILE_THRESHOLD, ApiClient, BatchUploader, FleetMonitor, LocalAnalyzer, LogMonitor, LogRecords,
+    LogUploader, PagedFile, Redactor, SearchIndex, UploadPipeline, detect_encoding, iter_file_chunks,
+    iter_log_lines, metrics,
+)
+from mclogs_mock import MockMclogsServer
+
+DEFAULT_SIZES = "10M,100M,1G"
+MB = 1024 * 1024
+
+
+class LogGenerator:
+    """合成 Minecraft 服务端日志：启动时的 Mod 加载刷屏，随后是混合级别的运行日志、
+    卡顿警告、带堆栈的异常，以及玩家进出（含IP与UUID）"""
+    
+    THREADS = ('Server thread', 'Worker-Main-3', 'IO-Worker-7', 'Netty Server IO #2', 'main')
+    PACKAGES = ('net.minecraft.server', 'net.minecraft.world.level', 'net.fabricmc.loader.impl',
+                'me.jellysquid.mods.lithium', 'com.example.mod.block', 'io.netty.channel')
+    EXCEPTIONS = ('java.lang.NullPointerException', 'java.lang.IllegalStateException',
+                  'java.util.ConcurrentModificationException', 'java.io.IOException',
+                  'java.lang.ArrayIndexOutOfBoundsException')
+    
+    def __init__(self, seed=0, mod_count=250, players=40):
+        self.random = random.Random(seed)
+        self.mods = [f"examplemod{i}" for i in range(mod_count)]
+        self.players = [f"Player{i:03d}" for i in range(players)]
+        self.clock = 8 * 3600
+    
+    def write(self, path, size):
+        """写出约 size 字节的日志"""
+        written = 0
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for batch in self._batches():
+                f.write(batch)
+                written += len(batch)
+                if written >= size:
+                    break
+        return path
+    
+    def lines(self, count):
+        """生成 count 条运行期日志（用于模拟追加写入）"""
+        out = []
+        while len(out) < count:
+            out.extend(self._entry())
+        return out
+    
+    def crash_report(self):
+        """合成一份崩溃报告"""
+        r = self.random
+        exception = r.choice(self.EXCEPTIONS)
+        lines = [
+            "---- Minecraft Crash Report ----",
+            "// Oops.",
+            "",
+            f"Time: 2024-03-14 {r.randrange(24):02d}:{r.randrange(60):02d}:{r.randrange(60):02d}",
+            "Description: Ticking entity",
+            "",
+            f"{exception}: Cannot invoke \"Object.hashCode()\" because \"key\" is null",
+        ]
+        lines += self._stack(r.randint(15, 40))
+        lines += ["", "", "A detailed walkthrough of the error, its code path and all known details is as follows:",
+                  "---------------------------------------------------------------------------------------",
+                  "", "-- Head --", "Thread: Server thread", "Stacktrace:"]
+        lines += self._stack(8)
+        lines += ["", "-- System Details --", "Details:", "\tMinecraft Version: 1.20.1",
+                  "\tJava Version: 17.0.10, Eclipse Adoptium",
+                  f"\tMemory: {r.randrange(1, 4) * 512}MB / 4096MB up to 8192MB",
+                  f"\tFabric Mods: {len(self.mods)} mods loaded"]
+        lines += [f"\t\t{mod}: Example Mod {mod} 1.{i % 9}.{i % 7}" for i, mod in enumerate(self.mods)]
+        return '\n'.join(lines) + '\n'
+    
+    def _batches(self, batch_lines=20000):
+        yield '\n'.join(self._startup()) + '\n'
+        while True:
+            yield '\n'.join(self.lines(batch_lines)) + '\n'
+    
+    def _header(self, thread, level):
+        self.clock = (self.clock + self.random.choice((0, 0, 0, 1))) % 86400
+        h, m, s = self.clock // 3600, self.clock // 60 % 60, self.clock % 60
+        return f"[{h:02d}:{m:02d}:{s:02d}] [{thread}/{level}]: "
+    
+    def _startup(self):
+        lines = [self._header('main', 'INFO') + "Loading Minecraft 1.20.1 with Fabric Loader 0.15.7",
+                 self._header('main', 'INFO') + f"Loading {len(self.mods)} mods:"]
+        lines += [f"\t- {mod} 1.{i % 9}.{i % 7}" for i, mod in enumerate(self.mods)]
+        for mod in self.mods:
+            if self.random.random() < 0.3:
+                lines.append(self._header('main', 'WARN') +
+                             f"Reference map '{mod}.refmap.json' for {mod}.mixins.json could not be read. "
+                             "If this is a development environment you can ignore this message")
+            lines.append(self._header('main', 'INFO') + f"Initializing {mod}")
+        lines.append(self._header('Server thread', 'INFO') + "Starting minecraft server version 1.20.1")
+        return lines
+    
+    def _entry(self):
+        """一条运行期日志（可能带多行堆栈）"""
+        r = self.random
+        roll = r.random()
+        if roll < 0.02:
+            exception = r.choice(self.EXCEPTIONS)
+            return ([self._header(r.choice(self.THREADS), 'ERROR') + "Encountered an unexpected exception",
+                     f"{exception}: {r.choice(('null', 'Index 5 out of bounds for length 5', 'Broken pipe'))}"]
+                    + self._stack(r.randint(5, 30)))
+        if roll < 0.05:
+            ms = r.randint(2000, 60000)
+            return [self._header('Server thread', 'WARN') +
+                    f"Can't keep up! Is the server overloaded? Running {ms}ms or {ms // 50} ticks behind"]
+        if roll < 0.08:
+            return [self._header(r.choice(self.THREADS), 'WARN') +
+                    f"Mod {r.choice(self.mods)} uses deprecated API, please update"]
+        if roll < 0.15:
+            return [self._header('Worker-Main-3', 'DEBUG') +
+                    f"Loaded chunk [{r.randint(-500, 500)}, {r.randint(-500, 500)}] in {r.randint(1, 90)}ms"]
+        if roll < 0.20:
+            player = r.choice(self.players)
+            ip = f"{r.randint(1, 223)}.{r.randrange(256)}.{r.randrange(256)}.{r.randint(1, 254)}"
+            return [self._header('User Authenticator #1', 'INFO') +
+                    f"UUID of player {player} is {uuid.UUID(int=r.getrandbits(128))}",
+                    self._header('Server thread', 'INFO') +
+                    f"{player}[/{ip}:{r.randint(1024, 65535)}] logged in with entity id {r.randint(1, 99999)} "
+                    f"at ({r.uniform(-1000, 1000):.2f}, {r.randint(60, 120)}.0, {r.uniform(-1000, 1000):.2f})"]
+        if roll < 0.25:
+            return [self._header('Server thread', 'INFO') + f"<{r.choice(self.players)}> hello world {r.randrange(1000)}"]
+        return [self._header('Server thread', 'INFO') +
+                r.choice(("Saving the game (this may take a moment!)", "Saved the game",
+                          "ThreadedAnvilChunkStorage: All dimensions are saved",
+                          f"{r.choice(self.players)} lost connection: Disconnected",
+                          f"[{r.choice(self.mods)}] Processed {r.randrange(10000)} block updates"))]
+    
+    def _stack(self, depth):
+        r = self.random
+        lines = [f"\tat {r.choice(self.PACKAGES)}.Class{r.randrange(200)}.method{r.randrange(50)}"
+                 f"(Class{r.randrange(200)}.java:{r.randint(10, 3000)}) ~[server.jar:?]"
+                 for _ in range(depth)]
+        if r.random() < 0.3:
+            lines.append(f"Caused by: {r.choice(self.EXCEPTIONS)}: nested")
+            lines += [f"\tat {r.choice(self.PACKAGES)}.Nested.run(Nested.java:{r.randint(10, 300)})"
+                      for _ in range(3)]
+            lines.append(f"\t... {depth} more")
+        return lines
+
+
+def parse_size(text):
+    """解析 10M / 1G / 512K 形式的大小"""
+    text = text.strip().upper()
+    units = {'K': 1024, 'M': MB, 'G': 1024 * MB}
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def prepare_workdir(workdir, sizes, seed, crash_reports):
+    """生成（或复用）各大小的日志文件与崩溃报告目录"""
+    os.makedirs(workdir, exist_ok=True)
+    paths = {}
+    for size in sizes:
+        path = os.path.join(workdir, f"synthetic-{size}-{seed}.log")
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            log(f"生成 {size // MB} MB 合成日志: {path}")
+            LogGenerator(seed).write(path, size)
+        paths[size] = path
+    
+    crash_dir = os.path.join(workdir, 'crash-reports')
+    if not os.path.isdir(crash_dir):
+        os.makedirs(crash_dir)
+        generator = LogGenerator(seed)
+        for i in range(crash_reports):
+            with open(os.path.join(crash_dir, f"crash-2024-03-14_12.00.{i:02d}-server.txt"), 'w',
+                      encoding='utf-8') as f:
+                f.write(generator.crash_report())
+    return paths, crash_dir
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+def measure(name, fn, repeat, size=None, **params):
+    """运行 fn repeat 次，返回一条结果记录；fn 可返回附加指标（dict）"""
+    timings, extra = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = fn()
+        timings.append(time.perf_counter() - start)
+    
+    best = min(timings)
+    result = {'name': name, 'size': size, 'params': params,
+              'seconds': [round(t, 6) for t in timings],
+              'best': round(best, 6), 'median': round(statistics.median(timings), 6)}
+    if size:
+        result['mb_per_s'] = round(size / MB / best, 2) if best else None
+    if extra:
+        result['metrics'] = extra
+    log(f"{name} ({size // MB if size else '-'} MB): 最佳 {best:.3f}s")
+    return result
+
+
+def bench_open_log_file(path):
+    """与界面 open_log_file 相同的路径：大文件只读取首页，小文件流式解码全部内容"""
+    size = os.path.getsize(path)
+    encoding = detect_encoding(path)
+    if size > LARGE_FILE_THRESHOLD:
+        return {'mode': 'paged', 'chars': len(PagedFile(path, encoding).read_page(0))}
+    return {'mode': 'stream', 'chars': sum(len(chunk) for chunk, done in iter_file_chunks(path, encoding))}
+
+
+def bench_highlight_ranges(path):
+    """apply_syntax_highlight 的非界面部分：解析文本框内容并计算每行的高亮范围（不含 Tk 标记）"""
+    size = os.path.getsize(path)
+    if size > LARGE_FILE_THRESHOLD:
+        content = PagedFile(path, detect_encoding(path)).read_page(0)
+    else:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+    records = LogRecords.from_text(content)
+    return {'records': len(records), 'headers': len(records.headers(0, records.line_count))}
+
+
+def bench_monitor_poll(workdir, lines_per_poll, seed):
+    """_monitor_logs 的一次轮询：latest.log 追加若干行后读取新内容并做本地分析"""
+    log_dir = os.path.join(workdir, 'monitor')
+    shutil.rmtree(log_dir, ignore_errors=True)
+    os.makedirs(log_dir)
+    log_path = os.path.join(log_dir, 'latest.log')
+    open(log_path, 'w').close()
+    
+    analyzer = LocalAnalyzer()
+    received = []
+    monitor = LogMonitor(log_dir, lambda lines: received.append(analyzer.analyze_lines(lines)))
+    monitor.poll()
+    text = '\n'.join(LogGenerator(seed).lines(lines_per_poll)) + '\n'
+    
+    def cycle():
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(text)
+        monitor.poll()
+    return cycle
+
+
+def bench_fleet_monitor(workdir, servers, lines_per_poll, seed):
+    """多服务器监控：servers 个服务器共用一个监视线程，测量其中一个服务器追加日志到收到全部新行的延迟
+    
+    返回 (每次测量的函数, 停止监控的函数)；各服务器轮流追加，延迟不应随服务器数量增长。
+    """
+    fleet_dir = os.path.join(workdir, f'fleet-{servers}')
+    shutil.rmtree(fleet_dir, ignore_errors=True)
+    paths = []
+    for i in range(servers):
+        log_dir = os.path.join(fleet_dir, f'server{i}', 'logs')
+        os.makedirs(log_dir)
+        paths.append(os.path.join(log_dir, 'latest.log'))
+        open(paths[-1], 'w').close()
+    
+    received = threading.Event()
+    state = {'lines': 0, 'target': 1, 'next': 0}
+    
+    def on_lines(server, lines):
+        state['lines'] += len(lines)
+        if state['lines'] >= state['target']:
+            received.set()
+    
+    monitor = FleetMonitor(os.path.join(fleet_dir, '*', 'logs'), on_lines)
+    threading.Thread(target=monitor.run, daemon=True).start()
+    # 监视器开始工作前写入的内容不会被读到，反复写入直到收到第一行
+    while not received.is_set():
+        with open(paths[0], 'a', encoding='utf-8') as f:
+            f.write("warmup\n")
+        received.wait(0.2)
+    
+    text = '\n'.join(LogGenerator(seed).lines(lines_per_poll)) + '\n'
+    
+    def cycle():
+        received.clear()
+        state['target'] = state['lines'] + lines_per_poll
+        path = paths[state['next'] % servers]
+        state['next'] += 1
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(text)
+        if not received.wait(10):
+            raise RuntimeError("监控未在10秒内收到新行")
+        return {'servers': len(monitor.servers)}
+    return cycle, monitor.stop
+
+
+# 脱敏回归样例：(原文, 期望结果)；地址默认隐藏，可确认的四段版本号保留
+REDACT_SAMPLES = (
+    ("Java 17.0.10.7", "Java 17.0.10.7"),
+    ("\t- sodium 0.5.8.1", "\t- sodium 0.5.8.1"),
+    ("\t\tsodium: Sodium 0.5.8.1", "\t\tsodium: Sodium 0.5.8.1"),
+    ("Loading sodium 0.5.8.1+mc1.20.1", "Loading sodium 0.5.8.1+mc1.20.1"),
+    ("Found mod file forge-1.12.2-14.23.5.2860.jar", "Found mod file forge-1.12.2-14.23.5.2860.jar"),
+    ("Minecraft Forge 14.23.5.2860 for 1.12.2", "Minecraft Forge 14.23.5.2860 for 1.12.2"),
+    ("Steve[/93.184.216.34:51234] logged in", "Player1[/**.**.**.**:51234] logged in"),
+    ("Connecting to 192.168.1.5, 25565", "Connecting to **.**.**.**, 25565"),
+    ("something 10.0.0.1 here", "something **.**.**.** here"),
+    ("Disconnecting 93.184.216.34:51234: Timed out", "Disconnecting **.**.**.**:51234: Timed out"),
+    ("Connection from 93.184.216.34 refused", "Connection from **.**.**.** refused"),
+    ("Failed to bind to address 93.184.216.34", "Failed to bind to address **.**.**.**"),
+    ("Query listener on [93.184.216.34]", "Query listener on [**.**.**.**]"),
+    ("Starting Minecraft server on 0.0.0.0:25565", "Starting Minecraft server on 0.0.0.0:25565"),
+)
+
+
+def check_redactor():
+    """运行基准前核对脱敏结果，规则回归时直接报错而不是只体现在耗时上"""
+    for text, expected in REDACT_SAMPLES:
+        actual = Redactor().redact(text)
+        if actual != expected:
+            raise RuntimeError(f"脱敏结果不符: {text!r} -> {actual!r}（期望 {expected!r}）")
+
+
+def bench_redact(path):
+    """上传前的隐私脱敏（与逐行读取的耗时对比即为脱敏本身的开销）"""
+    redactor = Redactor()
+    lines = sum(1 for line in redactor.redact_lines(iter_log_lines(path)))
+    return {'lines': lines, 'players': len(redactor.players)}
+
+
+def bench_upload_prepare(path, compress):
+    """上传准备：脱敏、裁剪与哈希（UploadPipeline.prepare），再生成编码、可选压缩后的请求体，不发送"""
+    pipeline = UploadPipeline(compress=compress)
+    with pipeline.prepare(lambda: iter_log_lines(path)) as prepared:
+        body_bytes = sum(len(chunk) for chunk in pipeline.body(prepared).factory())
+    return {'body_bytes': body_bytes}
+
+
+def bench_upload_roundtrip(server, path, compress):
+    """完整上传：上传准备并发送到本地模拟服务器（包含本机的网络往返）"""
+    uploader = LogUploader(ApiClient(server.api_base), pipeline=UploadPipeline(compress=compress))
+    received = server.stats['bytes_received']
+    result = uploader.upload_file(path)
+    return {'success': bool(result.get('success')), 'bytes_sent': server.stats['bytes_received'] - received}
+
+
+def bench_batch_upload(server, crash_dir):
+    """批量上传崩溃报告目录（每次运行前删除清单，保证全部重新上传）"""
+    manifest = os.path.join(crash_dir, BatchUploader.MANIFEST_NAME)
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    uploader = LogUploader(ApiClient(server.api_base))
+    manifest_path, succeeded, failed, skipped = BatchUploader(uploader, rate_per_host=1000).run(crash_dir)
+    return {'succeeded': succeeded, 'failed': failed}
+
+
+def run_benchmarks(args):
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), 'mclogs-bench')
+    paths, crash_dir = prepare_workdir(workdir, sizes, args.seed, args.crash_reports)
+    index_dir = os.path.join(workdir, 'index-cache')
+    results = []
+    check_redactor()
+    
+    for size, path in paths.items():
+        results.append(measure('open_log_file', lambda: bench_open_log_file(path), args.repeat, size))
+        results.append(measure('highlight_ranges', lambda: bench_highlight_ranges(path), args.repeat, size))
+        results.append(measure('parse_records', lambda: {'records': len(LogRecords.parse_file(path))},
+                               args.repeat, size))
+        results.append(measure('redact', lambda: bench_redact(path), args.repeat, size))
+        for compress in (False, True):
+            results.append(measure('upload_prepare', lambda: bench_upload_prepare(path, compress),
+                                   args.repeat, size, compress=compress))
+        results.append(measure('local_analysis', lambda: {'problems': len(LocalAnalyzer().analyze_lines(
+            iter_log_lines(path)))}, args.repeat, size))
+        
+        def build_index():
+            shutil.rmtree(index_dir, ignore_errors=True)
+            SearchIndex.open(path, cache_dir=index_dir).close()
+        results.append(measure('search_index_build', build_index, 1, size))
+        index = SearchIndex.open(path, cache_dir=index_dir)
+        for query, level in (('keep up', None), ('NullPointerException', 'ERROR'), ('examplemod12', None)):
+            results.append(measure('search_query', lambda: {'hits': len(index.search(query, level))},
+                                   args.repeat, size, query=query, level=level))
+        index.close()
+    
+    results.append(measure('monitor_poll', bench_monitor_poll(workdir, args.poll_lines, args.seed),
+                           args.repeat, lines=args.poll_lines))
+    for servers in sorted({1, args.fleet_servers}):
+        cycle, stop = bench_fleet_monitor(workdir, servers, args.poll_lines, args.seed)
+        try:
+            results.append(measure('fleet_monitor', cycle, args.repeat, servers=servers, lines=args.poll_lines))
+        finally:
+            stop()
+    
+    if importlib.util.find_spec('requests') is None:
+        log("未安装 requests，跳过上传测试")
+        results.append({'name': 'upload', 'skipped': "requests not installed"})
+        return workdir, results
+    
+    server = MockMclogsServer().start()
+    try:
+        for size, path in paths.items():
+            for compress in (False, True):
+                results.append(measure('upload_roundtrip', lambda: bench_upload_roundtrip(server, path, compress),
+                                       args.repeat, size, compress=compress))
+        results.append(measure('batch_upload', lambda: bench_batch_upload(server, crash_dir),
+                               args.repeat, files=args.crash_reports))
+    finally:
+        server.stop()
+    return workdir, results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Minecraft 日志分析工具基准测试")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"日志大小列表（默认 {DEFAULT_SIZES}）")
+    parser.add_argument('--repeat', type=int, default=3, help="每项测试重复次数")
+    parser.add_argument('--seed', type=int, default=0, help="合成日志的随机种子")
+    parser.add_argument('--workdir', help="合成数据目录（已生成的文件会被复用）")
+    parser.add_argument('--crash-reports', type=int, default=20, help="生成的崩溃报告数量")
+    parser.add_argument('--poll-lines', type=int, default=2000, help="每次监控轮询前追加的行数")
+    parser.add_argument('--fleet-servers', type=int, default=40, help="多服务器监控测试的服务器数量")
+    parser.add_argument('--label', default='', help="结果标签（例如版本号）")
+    parser.add_argument('--output', help="JSON结果输出文件（默认输出到标准输出）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    workdir, results = run_benchmarks(args)
+    report = {
+        'label': args.label,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workdir': workdir,
+        'results': results,
+        # 各热点路径的内部指标，便于定位基准结果中的耗时来自哪一步
+        'metrics': metrics.snapshot(),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        log(f"结果已写入: {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""Minecraft 日志分析工具 - 命令行/守护进程模式（不依赖 tkinter）
+
+用法示例:
+    python mclogs_cli.py --config mclogs.json monitor
+    python mclogs_cli.py monitor --log-dir '/srv/mc/*/logs'
+    python mclogs_cli.py upload logs/latest.log
+    python mclogs_cli.py upload logs/2024-03-14-1.log.gz logs/2024-03-14-2.log.gz logs/latest.log
+    python mclogs_cli.py batch /srv/mc/server1/logs
+    python mclogs_cli.py analyze crash-reports/crash.txt
+    python mclogs_cli.py stats --days 3 > stats.csv
+    python mclogs_cli.py stats --log-dir '/srv/mc/*/logs' > fleet.csv
+    python mclogs_cli.py --metrics-file metrics.json monitor
+"""
+import argparse
+import csv
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from mclogs_core import (
+    CACHE_DIR, ApiClient, BatchUploader, CrashClusterIndex, FleetMonitor, LocalAnalyzer, LogTimeSeries,
+    LogUploader, PersistentLRUCache, UploadPipeline, expand_log_dirs, iter_logs_lines, load_settings, metrics,
+    open_log_text, server_name,
+)
+
+
+def log(message):
+    """输出带时间戳的日志（与界面监控日志格式一致）"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Minecraft 日志分析工具（命令行模式）")
+    parser.add_argument('--config', help="JSON配置文件路径")
+    parser.add_argument('--api-base', help="API端点，例如 https://api.mclo.gs/1")
+    parser.add_argument('--timeout', type=int, help="请求超时(秒)")
+    parser.add_argument('--loader', choices=sorted(LocalAnalyzer.LOADER_PATTERNS),
+                        help="Mod加载器（用于本地分析）")
+    parser.add_argument('--no-redact', dest='redact_uploads', action='store_const', const=False,
+                        help="上传前不隐藏IP、UUID、玩家名与用户目录")
+    parser.add_argument('--metrics-file', help="运行指标输出文件（JSON），退出时写入")
+    parser.add_argument('--metrics-interval', type=float, 
+                        help="监控模式下定期写入指标文件的间隔(秒)")
+    
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    monitor = commands.add_parser('monitor', help="持续监控 latest.log（守护进程，可同时监控多个服务器）")
+    monitor.add_argument('--log-dir', nargs='+', 
+                         help="日志目录，可指定多个或使用通配符（例如 '/srv/mc/*/logs'）")
+    
+    upload = commands.add_parser('upload', help="上传日志文件（多个文件按顺序拼接为一个日志）")
+    upload.add_argument('paths', nargs='+')
+    
+    batch = commands.add_parser('batch', help="批量上传目录中的日志")
+    batch.add_argument('directory')
+    batch.add_argument('--workers', type=int, help="并发上传数")
+    
+    analyze = commands.add_parser('analyze', help="本地离线分析日志文件")
+    analyze.add_argument('path')
+    
+    stats = commands.add_parser('stats', help="按分钟输出服务器统计（CSV）")
+    stats.add_argument('--log-dir', nargs='+', 
+                       help="日志目录，可指定多个或使用通配符，多个服务器的统计按分钟相加")
+    stats.add_argument('--days', type=int, default=7, help="读取最近几天的归档")
+    
+    return parser
+
+
+def make_uploader(settings):
+    api = ApiClient(settings['api_base'], timeout=settings['timeout'])
+    cache = PersistentLRUCache(os.path.join(CACHE_DIR, 'uploads.json'))
+    return LogUploader(api, cache, UploadPipeline.from_settings(settings))
+
+
+def make_clusters():
+    return CrashClusterIndex(os.path.join(CACHE_DIR, 'crash_clusters.json'))
+
+
+def format_problem(problem):
+    message = problem['message']
+    if 'max_lag_ms' in problem:
+        message += f"，最长落后 {problem['max_lag_ms']} ms"
+    return f"第 {problem['line']} 行 ({problem['count']} 次): {message}"
+
+
+def start_metrics_writer(settings):
+    """后台定期写入指标文件，返回用于停止的事件"""
+    stop = threading.Event()
+    path, interval = settings['metrics_file'], settings['metrics_interval']
+    
+    def write_loop():
+        while not stop.wait(interval):
+            write_metrics(path)
+    
+    if path and interval > 0:
+        threading.Thread(target=write_loop, daemon=True).start()
+    return stop
+
+
+def write_metrics(path):
+    try:
+        metrics.dump(path)
+    except OSError as e:
+        log(f"写入指标文件失败: {e}")
+
+
+def run_monitor(settings):
+    """守护进程：跟踪各服务器的 latest.log 做本地分析，新的崩溃报告写完后立即上传
+    
+    所有服务器共用一个监视线程，输出的每一行都带服务器名；崩溃报告在单独的上传线程中处理，
+    上传慢或重试时不会耽误其他服务器的事件。
+    """
+    analyzer = LocalAnalyzer(settings['loader'])
+    uploader = make_uploader(settings)
+    clusters = make_clusters()
+    
+    def on_lines(server, lines):
+        log(f"[{server}] 检测到新日志内容 ({len(lines)} 行)")
+        for problem in analyzer.analyze_lines(lines):
+            log(f"[{server}] {format_problem(problem)}")
+    
+    def upload_crash(server, path):
+        name = os.path.basename(path)
+        try:
+            key, cluster = clusters.add_file(path)
+            if cluster and 'url' in cluster:
+                log(f"[{server}] 崩溃报告 {name} 与已上传的同类报告相同（第 {cluster['count']} 次）: {cluster['url']}")
+            else:
+                result = uploader.upload_file(path)
+                clusters.record_upload(key, path, result)
+                log(f"[{server}] 已上传崩溃报告 {name}: {result.get('url', result.get('error', ''))}")
+            clusters.save()
+        except Exception as e:
+            log(f"[{server}] 上传崩溃报告失败: {e}")
+    
+    # 只用一个线程：同类报告按到达顺序处理，第二份能复用第一份的链接，聚类索引也无需加锁
+    uploads = ThreadPoolExecutor(max_workers=1, thread_name_prefix='crash-upload')
+    
+    def on_crash(server, path):
+        uploads.submit(upload_crash, server, path)
+    
+    monitor = FleetMonitor(settings['log_dir'], on_lines, on_crash)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: monitor.stop())
+    
+    monitor.refresh()
+    log(f"日志监控已启动: {len(monitor.servers)} 个服务器 ({', '.join(sorted(monitor.servers.values()))})")
+    writer = start_metrics_writer(settings)
+    try:
+        monitor.run(on_error=lambda server, e: log(f"[{server}] 监控错误: {e}"))
+    finally:
+        uploads.shutdown(wait=True)  # 完成已排队的崩溃报告上传
+        writer.set()
+    log("日志监控已停止")
+    return 0
+
+
+def run_upload(settings, paths):
+    result = make_uploader(settings).upload(lambda: iter_logs_lines(paths))
+    if not result.get('success'):
+        log(f"上传失败: {result.get('error', '')}")
+        return 1
+    print(result.get('url', f"https://mclo.gs/{result['id']}"))
+    return 0
+
+
+def run_batch(settings, directory):
+    uploader = BatchUploader(make_uploader(settings), max_workers=settings['max_workers'],
+                             rate_per_host=settings['rate_per_host'], clusters=make_clusters())
+    
+    def progress(done, total, rel, entry):
+        status = entry.get('url') or '失败: ' + entry.get('error', '')
+        if 'duplicate_of' in entry:
+            status += f" (与 {entry['duplicate_of']} 同类)"
+        log(f"[{done}/{total}] {rel} -> {status}")
+    
+    manifest_path, succeeded, failed, skipped = uploader.run(directory, progress)
+    log(f"批量上传完成: 成功 {succeeded}，失败 {failed}，跳过 {skipped}，清单: {manifest_path}")
+    return 1 if failed else 0
+
+
+def run_analyze(settings, path):
+    with open_log_text(path) as f:
+        problems = LocalAnalyzer(settings['loader']).analyze_lines(f)
+    for problem in problems:
+        print(format_problem(problem))
+    if not problems:
+        print("未发现问题")
+    return 0
+
+
+def run_stats(settings, days):
+    """从 latest.log 与轮转归档统计每分钟的错误、卡顿、玩家进出与保存耗时，只输出有记录的分钟
+    
+    日志目录匹配到多个服务器时输出它们的合计（CSV写到标准输出，提示信息写到标准错误）。
+    """
+    log_dirs = expand_log_dirs(settings['log_dir'])
+    if not log_dirs:
+        print(f"没有匹配的日志目录: {settings['log_dir']}", file=sys.stderr)
+        return 1
+    if len(log_dirs) > 1:
+        print(f"合计 {len(log_dirs)} 个服务器: {', '.join(server_name(log_dir) for log_dir in log_dirs)}",
+              file=sys.stderr)
+    series = LogTimeSeries.from_directories(log_dirs, days)
+    columns = [series.columns[name] for name in series.COLUMNS]
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    writer.writerow(('time',) + series.COLUMNS)
+    for i in range(len(series)):
+        values = [column[i] for column in columns]
+        if any(values):
+            minute = datetime.fromtimestamp((series.origin + i) * 60)
+            writer.writerow([minute.strftime('%Y-%m-%d %H:%M')] + values)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    settings = load_settings(args.config)
+    
+    # 命令行参数优先于配置文件
+    overrides = {
+        'api_base': args.api_base,
+        'timeout': args.timeout,
+        'loader': args.loader,
+        'log_dir': getattr(args, 'log_dir', None),
+        'max_workers': getattr(args, 'workers', None),
+        'redact_uploads': args.redact_uploads,
+        'metrics_file': args.metrics_file,
+        'metrics_interval': args.metrics_interval,
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    
+    try:
+        if args.command == 'monitor':
+            return run_monitor(settings)
+        if args.command == 'upload':
+            return run_upload(settings, args.paths)
+        if args.command == 'batch':
+            return run_batch(settings, args.directory)
+        if args.command == 'stats':
+            return run_stats(settings, args.days)
+        return run_analyze(settings, args.path)
+    except Exception as e:
+        log(f"错误: {e}")
+        return 1
+    finally:
+        if settings['metrics_file']:
+            write_metrics(settings['metrics_file'])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2866 @@
+import os
+import re
+import io
+import glob
+import gzip
+import json
+import time
+import mmap
+import codecs
+import bisect
+import hashlib
+import select
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+import functools
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from urllib.parse import urlparse, quote_plus
+
+# 本地缓存目录（上传结果等）
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.mclogs_cache')
+
+DEFAULT_API_BASE = "https://api.mclo.gs/1"
+
+# 默认配置（界面与命令行/守护进程模式共用）
+DEFAULT_SETTINGS = {
+    'api_base': DEFAULT_API_BASE,
+    'timeout': 30,
+    'log_dir': '.minecraft/logs',  # 多个服务器时为列表或以 ; 分隔的字符串，支持通配符
+    'game_dir': '.minecraft',
+    'loader': 'Fabric',
+    'max_workers': 4,
+    'rate_per_host': 2.0,
+    'compress_uploads': False,
+    'redact_uploads': True,
+    'trim_head_lines': 1000,
+    'trim_tail_lines': 10000,
+    'trim_context_lines': 10,
+    'metrics_file': '',
+    'metrics_interval': 60,
+}
+
+# 超过该大小的文件按页打开，不整体放入文本框
+LARGE_FILE_THRESHOLD = 50 * 1024 * 1024
+
+# 一次匹配同时识别行首时间戳与日志级别（兼容 [HH:MM:SS] [Server thread/INFO]: 格式）
+LOG_LINE_PATTERN = re.compile(
+    r'(?=(?:.*?\[(?:[^\]\n]*/)?(?P<level>ERROR|WARN|INFO|DEBUG)\])?)'
+    r'(?P<timestamp>\[[^\]\n]*\])?',
+    re.IGNORECASE)
+
+
+class Metrics:
+    """热点路径的运行指标：计时器、计数器与瞬时值（线程安全）
+    
+    计时器只保留最近 window 个样本用于计算 p50/p95，次数与总耗时则累计全部调用。
+    """
+    
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._totals = {}  # 名称 -> [次数, 总耗时]
+            self._counters = {}
+            self._gauges = {}
+    
+    def timer(self, name):
+        """计时上下文：with metrics.timer('file.decode_chunk'): ..."""
+        return MetricsTimer(self, name)
+    
+    def timed(self, name):
+        """计时装饰器，统计函数每次调用的耗时"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with MetricsTimer(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+    
+    def observe(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._totals[name] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+    
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+    
+    def gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+    
+    def snapshot(self):
+        """返回 {'timers': {名称: {count, total, p50, p95, max}}, 'counters': {...}, 'gauges': {...}}（单位：秒）"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            totals = {name: tuple(values) for name, values in self._totals.items()}
+            counters, gauges = dict(self._counters), dict(self._gauges)
+        
+        timers = {}
+        for name, ordered in samples.items():
+            count, total = totals[name]
+            timers[name] = {'count': count, 'total': total,
+                            'p50': self._percentile(ordered, 0.50),
+                            'p95': self._percentile(ordered, 0.95),
+                            'max': ordered[-1]}
+        return {'timers': timers, 'counters': counters, 'gauges': gauges}
+    
+    def dump(self, path):
+        """把当前快照写入 JSON 指标文件（先写临时文件再替换，读取方不会看到半个文件）"""
+        data = dict(self.snapshot(), time=time.time())
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    
+    @staticmethod
+    def _percentile(ordered, q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsTimer:
+    __slots__ = ('metrics', 'name', 'start')
+    
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+# 进程内共享的指标实例（界面"性能"页与命令行 --metrics-file 读取的都是它）
+metrics = Metrics()
+
+
+class LogTailer:
+    """增量跟踪日志文件：记录字节偏移与inode，每次只读取新追加的内容"""
+    
+    # Minecraft 轮转后的归档文件名，例如 2024-01-31-2.log.gz
+    ROTATED_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}-\d+\.log\.gz$')
+    
+    def __init__(self, path, encoding='utf-8', chunk_size=1024 * 1024):
+        self.path = path
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.inode = None
+        self._partial = b''
+        self._last_read = 0.0
+    
+    def seek_to_end(self):
+        """从文件当前末尾开始跟踪（忽略已有内容）"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self.offset, self.inode = 0, None
+        else:
+            self.offset, self.inode = st.st_size, (st.st_dev, st.st_ino)
+        self._partial = b''
+    
+    def poll(self):
+        """读取上次调用以来新增的完整行"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        
+        lines = []
+        inode = (st.st_dev, st.st_ino)
+        if self.inode is None:
+            self.inode = inode
+        elif inode != self.inode or st.st_size < self.offset:
+            # 日志已轮转（压缩为 .gz 后截断或重建），先补读归档中未读的部分
+            lines.extend(self._drain_rotated())
+            self.inode = inode
+            self.offset = 0
+        
+        if st.st_size > self.offset:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                while True:
+                    data = f.read(self.chunk_size)
+                    if not data:
+                        break
+                    self.offset += len(data)
+                    metrics.count('file.bytes_read', len(data))
+                    lines.extend(self._split(data))
+            self._last_read = time.time()
+        return lines
+    
+    def _drain_rotated(self):
+        """从最新的轮转归档中读取旧文件剩余的内容"""
+        lines = []
+        archive = self._latest_archive()
+        if archive:
+            try:
+                with gzip.open(archive, 'rb') as f:
+                    f.seek(self.offset)
+                    while True:
+                        data = f.read(self.chunk_size)
+                        if not data:
+                            break
+                        lines.extend(self._split(data))
+            except (OSError, EOFError):
+                pass
+        
+        # 旧文件最后一行即使没有换行也已完整
+        if self._partial:
+            lines.append(self._decode(self._partial))
+            self._partial = b''
+        return lines
+    
+    def _latest_archive(self):
+        """查找同目录下最新的轮转归档"""
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            entries = [e for e in os.scandir(directory)
+                       if self.ROTATED_PATTERN.match(e.name)]
+        except OSError:
+            return None
+        if not entries:
+            return None
+        latest = max(entries, key=lambda e: e.stat().st_mtime)
+        # 归档必须是在上次读取之后生成的，否则不是刚才轮转出去的那份
+        if latest.stat().st_mtime < self._last_read:
+            return None
+        return latest.path
+    
+    def _split(self, data):
+        """将字节块切分为完整行，不完整的末尾留到下次"""
+        data = self._partial + data
+        parts = data.split(b'\n')
+        self._partial = parts.pop()
+        return [self._decode(p) for p in parts]
+    
+    def _decode(self, raw):
+        return raw.rstrip(b'\r').decode(self.encoding, errors='replace')
+
+
+def load_settings(path=None):
+    """读取JSON配置文件并与默认配置合并"""
+    settings = dict(DEFAULT_SETTINGS)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f))
+    return settings
+
+
+class InotifyWatcher:
+    """基于 inotify 的目录监视（仅 Linux，通过 ctypes 调用 libc）"""
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    EVENT_HEADER = struct.Struct('iIII')
+    
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs = {}
+        # 自管道：其他线程可借此唤醒阻塞中的 wait()
+        self._wake_r, self._wake_w = os.pipe()
+    
+    def add(self, directory):
+        """开始监视目录"""
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            raise OSError(f"无法监视目录: {directory}")
+        self._dirs[wd] = directory
+    
+    def wait(self, timeout=None):
+        """阻塞直到有事件，返回 [(目录, 文件名, 'modified'|'written'), ...]"""
+        readable, _, _ = select.select([self.fd, self._wake_r], [], [], timeout)
+        if self._wake_r in readable:
+            os.read(self._wake_r, 4096)
+        if self.fd not in readable:
+            return []
+        
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        
+        events, pos = [], 0
+        while pos < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, pos)
+            pos += self.EVENT_HEADER.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            
+            if mask & self.IN_Q_OVERFLOW:
+                # 事件队列溢出，视为所有目录都有变化
+                events.extend((d, '', 'modified') for d in self._dirs.values())
+            elif wd in self._dirs:
+                kind = 'written' if mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO) else 'modified'
+                events.append((self._dirs[wd], name, kind))
+        return events
+    
+    def wake(self):
+        """唤醒阻塞中的 wait()"""
+        os.write(self._wake_w, b'\0')
+    
+    def close(self):
+        for fd in (self.fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+
+class PollingWatcher:
+    """轮询方式的目录监视（inotify 不可用时使用），空闲时逐渐延长轮询间隔"""
+    
+    def __init__(self, min_interval=0.25, max_interval=5.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._snapshots = {}
+        self._changed = {}
+        self._wake = threading.Event()
+    
+    def add(self, directory):
+        self._snapshots[directory] = self._snapshot(directory)
+        self._changed[directory] = set()
+    
+    def wait(self, timeout=None):
+        """阻塞直到有事件，返回 [(目录, 文件名, 'modified'|'written'), ...]"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+            if self._wake.wait(delay):
+                self._wake.clear()
+                return []
+            
+            events = self._scan()
+            if events:
+                self.interval = self.min_interval
+                return events
+            self.interval = min(self.interval * 2, self.max_interval)
+            if deadline is not None and time.monotonic() >= deadline:
+                return []
+    
+    def wake(self):
+        self._wake.set()
+    
+    def close(self):
+        pass
+    
+    def _scan(self):
+        events = []
+        for directory, previous in self._snapshots.items():
+            current = self._snapshot(directory)
+            changed = {name for name, stat in current.items() if previous.get(name) != stat}
+            events.extend((directory, name, 'modified') for name in changed)
+            # 上次有变化、这次大小和时间都不再变化，视为已写完
+            events.extend((directory, name, 'written')
+                          for name in self._changed[directory] - changed if name in current)
+            self._snapshots[directory] = current
+            self._changed[directory] = changed
+        return events
+    
+    @staticmethod
+    def _snapshot(directory):
+        try:
+            with os.scandir(directory) as entries:
+                return {e.name: (e.stat().st_size, e.stat().st_mtime_ns)
+                        for e in entries if e.is_file()}
+        except OSError:
+            return {}
+
+
+def crash_dir_for(log_dir):
+    """服务器目录结构中与 logs/ 同级的 crash-reports/ 目录"""
+    return os.path.join(os.path.dirname(os.path.abspath(log_dir)), 'crash-reports')
+
+
+def expand_log_dirs(spec):
+    """展开日志目录配置：列表或以 ; 分隔的字符串，每项可含通配符（例如 /srv/mc/*/logs）
+    
+    不含通配符的目录即使暂不存在也保留（监控会定期重试），含通配符的只保留已存在的目录。
+    """
+    patterns = spec.split(';') if isinstance(spec, str) else spec
+    dirs = []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        if glob.has_magic(pattern):
+            dirs.extend(sorted(path for path in glob.glob(pattern) if os.path.isdir(path)))
+        else:
+            dirs.append(pattern)
+    return list(dict.fromkeys(dirs))
+
+
+def server_name(log_dir):
+    """服务器名：日志目录为 <服务器目录>/logs 时取服务器目录名，否则取日志目录名"""
+    path = os.path.abspath(log_dir)
+    name = os.path.basename(path)
+    return os.path.basename(os.path.dirname(path)) if name == 'logs' else name
+
+
+def create_watcher():
+    """优先使用 inotify，不可用时退回自适应轮询"""
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        return PollingWatcher()
+
+
+class LogDirectoryIndex:
+    """目录中日志文件的缓存索引，按修改时间排序，查询最新文件不再扫描目录
+    
+    首次查询时用一次 os.scandir 建立；文件内容的写入由文件监视事件（update）增量更新排序，
+    每次查询只检查一次目录本身的修改时间，有文件增删（新日志、轮转、崩溃报告）才重新扫描。
+    """
+    
+    SUFFIXES = ('.log', '.txt', '.log.gz')
+    # 轮转归档 YYYY-MM-DD-N.log.gz：(日期, 当天序号)
+    ARCHIVE_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2})-(\d+)\.log\.gz$')
+    
+    def __init__(self, directory, suffixes=SUFFIXES):
+        self.directory = directory
+        self.suffixes = suffixes
+        self._lock = threading.Lock()
+        self._mtimes = {}   # 文件名 -> 修改时间(ns)
+        self._order = []    # [(修改时间, 文件名)]，最新的在末尾
+        self._dir_mtime = None
+    
+    def refresh(self):
+        """重新扫描整个目录"""
+        mtimes = {}
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffixes) and entry.is_file():
+                        mtimes[entry.name] = entry.stat().st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        metrics.count('dir_index.scans')
+        with self._lock:
+            self._mtimes = mtimes
+            self._order = sorted((mtime, name) for name, mtime in mtimes.items())
+            self._dir_mtime = dir_mtime
+    
+    def update(self, name):
+        """文件事件：重新检查单个文件（name 为空表示事件丢失，整体重新扫描）"""
+        if not name:
+            return self.refresh()
+        if not name.endswith(self.suffixes):
+            return
+        try:
+            mtime = os.stat(os.path.join(self.directory, name)).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if self._dir_mtime is None:
+                return  # 尚未建立，首次查询时会完整扫描
+            old = self._mtimes.pop(name, None)
+            if old is not None:
+                del self._order[bisect.bisect_left(self._order, (old, name))]
+            if mtime is not None:
+                self._mtimes[name] = mtime
+                bisect.insort(self._order, (mtime, name))
+    
+    def latest(self, suffixes=None):
+        """最新文件的路径（可只考虑指定后缀），没有时返回 None"""
+        self._validate()
+        with self._lock:
+            for mtime, name in reversed(self._order):
+                if suffixes is None or name.endswith(suffixes):
+                    return os.path.join(self.directory, name)
+        return None
+    
+    def files(self):
+        """按修改时间从新到旧排列的全部文件路径"""
+        self._validate()
+        with self._lock:
+            return [os.path.join(self.directory, name) for mtime, name in reversed(self._order)]
+    
+    def archives(self, first=None, last=None):
+        """日期在 [first, last]（YYYY-MM-DD，None 表示不限）内的轮转归档，按日期和序号从旧到新"""
+        self._validate()
+        with self._lock:
+            names = list(self._mtimes)
+        found = []
+        for name in names:
+            match = self.ARCHIVE_PATTERN.match(name)
+            if match is None:
+                continue
+            date = match.group(1)
+            if (first is None or date >= first) and (last is None or date <= last):
+                found.append((date, int(match.group(2)), name))
+        return [os.path.join(self.directory, name) for date, number, name in sorted(found)]
+    
+    def history(self, first=None, last=None):
+        """按时间顺序排列的日期范围内的日志：轮转归档，范围包含今天时再加上 latest.log"""
+        paths = self.archives(first, last)
+        latest = os.path.join(self.directory, 'latest.log')
+        if (last is None or last >= time.strftime('%Y-%m-%d')) and os.path.isfile(latest):
+            paths.append(latest)
+        return paths
+    
+    def _validate(self):
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        if dir_mtime is None or dir_mtime != self._dir_mtime:
+            self.refresh()
+
+
+class LogMonitor:
+    """日志监控核心（不依赖界面）：跟踪 log_dir/latest.log 并把新行交给回调，
+    同时监视 crash-reports/ 目录中新写完的崩溃报告；on_event 可接收全部文件事件（例如维护目录索引）"""
+    
+    def __init__(self, log_dir, on_lines, crash_dir=None, on_crash=None, retry_interval=5,
+                 on_event=None):
+        self.log_dir = log_dir
+        self.on_lines = on_lines
+        self.crash_dir = crash_dir
+        self.on_crash = on_crash
+        self.retry_interval = retry_interval
+        self.on_event = on_event
+        self._tailer = None
+        self._watcher = None
+        self._stop = threading.Event()
+    
+    @metrics.timed('monitor.poll')
+    def poll(self):
+        """检查一次新内容"""
+        log_path = os.path.join(self.log_dir, "latest.log")
+        if self._tailer is None or self._tailer.path != log_path:
+            # 首次启动或目录变更时从文件末尾开始跟踪
+            self._tailer = LogTailer(log_path)
+            self._tailer.seek_to_end()
+        
+        lines = self._tailer.poll()
+        if lines:
+            self.on_lines(lines)
+    
+    def run(self, on_error=None):
+        """由文件事件驱动，直到调用 stop()"""
+        self._watcher = watcher = create_watcher()
+        watched = set()
+        dirty = True
+        try:
+            while not self._stop.is_set():
+                for directory in (self.log_dir, self.crash_dir):
+                    if directory and directory not in watched and os.path.isdir(directory):
+                        watcher.add(directory)
+                        watched.add(directory)
+                
+                if dirty:
+                    try:
+                        self.poll()
+                    except Exception as e:
+                        if on_error:
+                            on_error(e)
+                    dirty = False
+                
+                # 目录都已存在时无限期等待事件，否则定期重试
+                missing = self.log_dir not in watched or (self.crash_dir and self.crash_dir not in watched)
+                for directory, name, kind in watcher.wait(self.retry_interval if missing else None):
+                    if self.on_event:
+                        self.on_event(directory, name, kind)
+                    if directory == self.log_dir:
+                        dirty = True
+                    elif (directory == self.crash_dir and kind == 'written'
+                          and name.endswith('.txt') and self.on_crash):
+                        self.on_crash(os.path.join(directory, name))
+        finally:
+            self._watcher = None
+            watcher.close()
+    
+    def stop(self):
+        """停止 run()（可从其他线程或信号处理函数调用）"""
+        self._stop.set()
+        watcher = self._watcher
+        if watcher:
+            watcher.wake()
+
+
+class FleetMonitor:
+    """多服务器日志监控：一个线程、一个文件监视器同时跟踪多个服务器的 latest.log 与 crash-reports/
+    
+    只有收到 latest.log 事件的服务器才读取新内容，空闲的服务器不占用 CPU，每个服务器只保存一个跟踪器。
+    回调都带服务器名：on_lines(服务器, 行列表)、on_crash(服务器, 崩溃报告路径)、run 的 on_error(服务器, 异常)；
+    含通配符的目录每隔 rescan_interval 秒重新展开，新出现的服务器自动加入。
+    """
+    
+    def __init__(self, log_dirs, on_lines, on_crash=None, retry_interval=5, rescan_interval=30,
+                 on_event=None):
+        self.log_dirs = log_dirs
+        self.on_lines = on_lines
+        self.on_crash = on_crash
+        self.retry_interval = retry_interval
+        self.rescan_interval = rescan_interval
+        self.on_event = on_event
+        self.servers = {}      # 日志目录 -> 服务器名
+        self._tailers = {}     # 日志目录 -> LogTailer
+        self._crash_dirs = {}  # crash-reports 目录 -> 日志目录
+        self._patterns = any(glob.has_magic(pattern) for pattern in
+                             (log_dirs.split(';') if isinstance(log_dirs, str) else log_dirs))
+        self._watcher = None
+        self._stop = threading.Event()
+    
+    def refresh(self):
+        """重新展开日志目录，新服务器从 latest.log 当前末尾开始跟踪"""
+        names = set(self.servers.values())
+        for log_dir in expand_log_dirs(self.log_dirs):
+            if log_dir in self.servers:
+                continue
+            name = server_name(log_dir)
+            if name in names:
+                name = log_dir  # 同名的服务器用完整路径区分
+            names.add(name)
+            self.servers[log_dir] = name
+            self._crash_dirs[crash_dir_for(log_dir)] = log_dir
+            tailer = self._tailers[log_dir] = LogTailer(os.path.join(log_dir, "latest.log"))
+            tailer.seek_to_end()
+        metrics.gauge('fleet.servers', len(self.servers))
+    
+    @metrics.timed('monitor.poll')
+    def poll(self, log_dir):
+        """读取一个服务器的新内容"""
+        lines = self._tailers[log_dir].poll()
+        if lines:
+            self.on_lines(self.servers[log_dir], lines)
+    
+    def run(self, on_error=None):
+        """由文件事件驱动，直到调用 stop()"""
+        self._watcher = watcher = create_watcher()
+        watched = set()
+        dirty = set()
+        next_rescan = 0
+        try:
+            while not self._stop.is_set():
+                if time.monotonic() >= next_rescan:
+                    self.refresh()
+                    next_rescan = time.monotonic() + self.rescan_interval
+                
+                missing = False
+                for directory in list(self.servers) + list(self._crash_dirs):
+                    if directory in watched:
+                        continue
+                    if not os.path.isdir(directory):
+                        missing = True
+                        continue
+                    try:
+                        watcher.add(directory)
+                    except OSError as e:
+                        # 例如权限不足或监视数量达到上限：报告后在下次重试时再添加
+                        missing = True
+                        if on_error:
+                            on_error(self.servers[self._crash_dirs.get(directory, directory)], e)
+                        continue
+                    watched.add(directory)
+                
+                for log_dir in dirty:
+                    try:
+                        self.poll(log_dir)
+                    except Exception as e:
+                        if on_error:
+                            on_error(self.servers[log_dir], e)
+                dirty.clear()
+                
+                # 目录都已存在且没有通配符时无限期等待事件，否则定期重试或重新展开
+                if missing:
+                    timeout = max(0.0, min(self.retry_interval, next_rescan - time.monotonic()))
+                elif self._patterns:
+                    timeout = max(0.0, next_rescan - time.monotonic())
+                else:
+                    timeout = None
+                for directory, name, kind in watcher.wait(timeout):
+                    if self.on_event:
+                        self.on_event(directory, name, kind)
+                    if directory in self.servers:
+                        if name in ('latest.log', ''):
+                            dirty.add(directory)
+                    elif (directory in self._crash_dirs and kind == 'written'
+                          and name.endswith('.txt') and self.on_crash):
+                        server = self.servers[self._crash_dirs[directory]]
+                        self.on_crash(server, os.path.join(directory, name))
+        finally:
+            self._watcher = None
+            watcher.close()
+    
+    def stop(self):
+        """停止 run()（可从其他线程或信号处理函数调用）"""
+        self._stop.set()
+        watcher = self._watcher
+        if watcher:
+            watcher.wake()
+
+
+def detect_encoding(path, sample_size=64 * 1024):
+    """根据文件开头的有限样本推断编码"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    
+    for encoding in ('utf-8', 'latin-1', 'cp1252'):
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # 样本末尾可能截断了一个多字节字符
+            if e.reason == 'unexpected end of data' and e.start >= len(sample) - 3:
+                return encoding
+    return 'utf-8'
+
+
+def iter_file_chunks(path, encoding, chunk_size=1024 * 1024):
+    """通过内存映射分块读取并解码文件，产出 (文本块, 已读取字节数)"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    
+    # 统一换行符，与文本模式读取的结果一致
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(errors='replace'), translate=True)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, size, chunk_size):
+            end = min(start + chunk_size, size)
+            with metrics.timer('file.decode_chunk'):
+                text = decoder.decode(mm[start:end], final=end == size)
+            metrics.count('file.bytes_read', end - start)
+            yield text, end
+
+
+def iter_log_chunks(paths, chunk_size=1024 * 1024):
+    """依次流式读取多个日志文件（.gz 归档边读边解压），产出 (文本块, 累计读取的磁盘字节数)
+    
+    文件之间补足换行，拼接结果与把各文件首尾相连后逐行读取一致。
+    """
+    done, ends_with_newline = 0, True
+    for path in paths:
+        if not ends_with_newline:
+            yield '\n', done
+            ends_with_newline = True
+        if path.endswith('.gz'):
+            chunks = _iter_gzip_chunks(path, chunk_size)
+        else:
+            chunks = iter_file_chunks(path, detect_encoding(path), chunk_size)
+        read = 0
+        for text, read in chunks:
+            if text:
+                ends_with_newline = text.endswith('\n')
+                yield text, done + read
+        done += read
+
+
+def _iter_gzip_chunks(path, chunk_size):
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder('utf-8')(errors='replace'), translate=True)
+    with open(path, 'rb') as raw, gzip.GzipFile(fileobj=raw) as f:
+        while True:
+            data = f.read(chunk_size)
+            metrics.count('file.bytes_read', len(data))
+            yield decoder.decode(data, final=not data), raw.tell()
+            if not data:
+                return
+
+
+class PagedFile:
+    """按页访问大文件，每页是按换行对齐的一段字节"""
+    
+    def __init__(self, path, encoding, page_size=2 * 1024 * 1024):
+        self.path = path
+        self.encoding = encoding
+        self.page_size = page_size
+        self.size = os.path.getsize(path)
+        self._starts = [0]
+    
+    @property
+    def page_count(self):
+        """页数（按页大小估算）"""
+        return max(1, -(-self.size // self.page_size))
+    
+    @metrics.timed('file.read_page')
+    def read_page(self, index):
+        """读取第 index 页的文本"""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while len(self._starts) <= index + 1 and self._next_start(mm):
+                pass
+            
+            index = min(index, len(self._starts) - 2)
+            data = mm[self._starts[index]:self._starts[index + 1]]
+        metrics.count('file.bytes_read', len(data))
+        return data.decode(self.encoding, errors='replace').replace('\r\n', '\n')
+    
+    def locate(self, offset):
+        """返回字节偏移所在的 (页号, 页内行号)"""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while self._starts[-1] <= offset and self._next_start(mm):
+                pass
+            
+            page = min(bisect.bisect_right(self._starts, offset), len(self._starts) - 1) - 1
+            return page, mm[self._starts[page]:offset].count(b'\n')
+    
+    def _next_start(self, mm):
+        """计算下一页的起始偏移，已到文件末尾时返回 False"""
+        # 页边界按需计算，只需在每个边界附近查找一次换行
+        prev = self._starts[-1]
+        if prev >= self.size:
+            return False
+        newline = mm.find(b'\n', min(prev + self.page_size, self.size))
+        self._starts.append(self.size if newline < 0 else newline + 1)
+        return True
+    
+    def is_last_page(self, index):
+        return len(self._starts) > index + 1 and self._starts[index + 1] >= self.size
+
+
+class LineIndex:
+    """内存映射文件上的稀疏行偏移索引：每 STRIDE 行记录一次起始偏移，内存占用很小"""
+    
+    STRIDE = 64
+    _BLOCK = re.compile(rb'(?:[^\n]*\n){64}')
+    
+    def __init__(self, path=None, encoding=None, data=None):
+        self.path = path
+        if data is not None:
+            # 直接索引内存中的数据（例如粘贴的内容）
+            self.encoding = encoding or 'utf-8'
+            self._file = None
+            self.size = len(data)
+            self._mm = data if self.size else None
+        else:
+            self.encoding = encoding or detect_encoding(path)
+            self._file = open(path, 'rb')
+            self.size = os.fstat(self._file.fileno()).st_size
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._offsets = array('Q', [0])
+        self._count = 0
+        self._lock = threading.Lock()
+        self._building = False
+        self._closed = False
+        self.complete = self._mm is None
+    
+    def build(self):
+        """扫描全文建立索引（可在后台线程中调用，构建期间即可读取已索引的行）"""
+        with self._lock:
+            if self._closed or self.complete:
+                return
+            self._building = True
+        try:
+            with metrics.timer('index.lines'):
+                last = 0
+                # 正则在C层一次跨过 STRIDE 行，Python层每 STRIDE 行才执行一次
+                for match in self._BLOCK.finditer(self._mm):
+                    if self._closed:
+                        return
+                    last = match.end()
+                    self._offsets.append(last)
+                    self._count += self.STRIDE
+                
+                rest = self._mm[last:]
+                self._count += rest.count(b'\n') + (1 if rest and not rest.endswith(b'\n') else 0)
+            self.complete = True
+        finally:
+            with self._lock:
+                self._building = False
+                closed = self._closed
+            if closed:
+                self._release()
+    
+    def __len__(self):
+        return self._count
+    
+    @property
+    def buffer(self):
+        """底层数据（内存映射或字节串）"""
+        return self._mm
+    
+    def block_range(self, block):
+        """第 block 个索引块（STRIDE 行）的字节范围"""
+        start = self._offsets[block]
+        end = self._offsets[block + 1] if block + 1 < len(self._offsets) else self.size
+        return start, end
+    
+    @property
+    def block_count(self):
+        if self.size == 0:
+            return 0
+        return len(self._offsets) if self._offsets[-1] < self.size else len(self._offsets) - 1
+    
+    def restore(self, offsets, count):
+        """从持久化数据恢复索引，无需重新扫描"""
+        self._offsets = offsets
+        self._count = count
+        self.complete = True
+    
+    def offset_of(self, line):
+        """第 line 行（从0开始）的起始字节偏移"""
+        pos = self._offsets[line // self.STRIDE]
+        for _ in range(line % self.STRIDE):
+            pos = self._mm.find(b'\n', pos) + 1
+        return pos
+    
+    def lines(self, start, count):
+        """读取从第 start 行（从0开始）起的 count 行"""
+        if self._closed or self._mm is None:
+            return []
+        count = min(count, self._count - start)
+        pos = self.offset_of(start) if count > 0 else 0
+        
+        result = []
+        for _ in range(count):
+            end = self._mm.find(b'\n', pos)
+            if end < 0:
+                end = self.size
+            result.append(self._mm[pos:end].rstrip(b'\r').decode(self.encoding, errors='replace'))
+            pos = end + 1
+        return result
+    
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._building:
+                return  # 构建线程退出时再释放映射
+        self._release()
+    
+    def _release(self):
+        if self._file is not None:
+            if self._mm is not None:
+                self._mm.close()
+            self._file.close()
+        self._mm = None
+
+
+INDEX_CACHE_MAGIC = b'MCLOGIDX'
+
+
+def save_index_cache(path, header, arrays):
+    """写入索引缓存：魔数、JSON 头与各数组的原始字节（不用 pickle，读取缓存不会执行任何代码）"""
+    head = json.dumps(dict(header, byteorder=sys.byteorder,
+                           arrays=[(a.typecode, len(a)) for a in arrays])).encode('utf-8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_CACHE_MAGIC + struct.pack('<I', len(head)) + head)
+        for a in arrays:
+            a.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_index_cache(path):
+    """读取 save_index_cache 写入的缓存，返回 (JSON 头, 数组列表)；文件缺失、损坏或格式不符时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(INDEX_CACHE_MAGIC)) != INDEX_CACHE_MAGIC:
+                return None
+            size, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(size))
+            if header.get('byteorder') != sys.byteorder:
+                return None
+            arrays = []
+            for typecode, length in header['arrays']:
+                a = array(typecode)
+                a.fromfile(f, length)
+                arrays.append(a)
+    except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError, struct.error):
+        return None
+    return header, arrays
+
+
+class GzipLineIndex:
+    """.gz 归档上的稀疏行偏移索引，接口与 LineIndex 相同，全程流式解压、不把全文读入内存
+    
+    解压时每输出 CHECKPOINT_SIZE 字节保存一次解压器状态（zlib 解压对象的副本），
+    读取任意行时从最近的检查点继续解压。行偏移与行数以文件指纹为键缓存在磁盘上，
+    再次打开同一归档时无需重新扫描；检查点只在内存中，按需在读取时补建。
+    """
+    
+    STRIDE = LineIndex.STRIDE
+    VERSION = 2
+    CHECKPOINT_SIZE = 2 * 1024 * 1024
+    READ_SIZE = 256 * 1024
+    
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self.size = 0  # 解压后的大小，建立索引后确定
+        self._offsets = array('Q', [0])
+        self._count = 0
+        self._points = array('Q', [0])   # 检查点的解压后偏移
+        self._states = [(0, None)]       # 检查点的 (压缩偏移, 解压器副本)，None 表示从文件开头
+        self._lock = threading.Lock()
+        self._cache_path = None
+        self._closed = False
+        self.complete = False
+    
+    @classmethod
+    def open(cls, path, cache_dir=CACHE_DIR):
+        """打开归档的索引：缓存命中时直接得到行偏移，否则需要调用 build()"""
+        index = cls(path)
+        index._cache_path = os.path.join(cache_dir, 'index', SearchIndex.cache_key(path) + '.lines')
+        if index._load():
+            metrics.count('cache.gzip_index.hit')
+        else:
+            metrics.count('cache.gzip_index.miss')
+        return index
+    
+    @staticmethod
+    def uncompressed_size(path):
+        """从 gzip 尾部读取解压后的大小（对 4GB 取模，多成员归档只含最后一个成员）"""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < 4:
+                return 0
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', f.read(4))[0]
+    
+    def build(self):
+        """解压全文建立索引（可在后台线程中调用，构建期间即可读取已索引的行）"""
+        if self._closed or self.complete:
+            return
+        with metrics.timer('index.gzip_lines'):
+            block = LineIndex._BLOCK
+            carry, base = b'', 0
+            for pos, data in self._inflate(0):
+                data = carry + data
+                last = 0
+                for match in block.finditer(data):
+                    last = match.end()
+                    self._offsets.append(base + last)
+                    self._count += self.STRIDE
+                carry, base = data[last:], base + last
+            if self._closed:
+                return
+            self._count += carry.count(b'\n') + (1 if carry and not carry.endswith(b'\n') else 0)
+            self.size = base + len(carry)
+            self.complete = True
+        if self._cache_path:
+            try:
+                self._save()
+            except OSError:
+                pass  # 索引写入失败只影响下次打开的速度
+    
+    def __len__(self):
+        return self._count
+    
+    def lines(self, start, count):
+        """读取从第 start 行（从0开始）起的 count 行"""
+        count = min(count, self._count - start)
+        if self._closed or count <= 0:
+            return []
+        offset = self._offsets[start // self.STRIDE]
+        skip = start % self.STRIDE
+        
+        buf = b''
+        for pos, data in self._inflate(offset):
+            if pos + len(data) <= offset:
+                continue
+            buf += data[max(offset - pos, 0):]
+            if buf.count(b'\n') >= skip + count:
+                break
+        return [line.rstrip(b'\r').decode(self.encoding, errors='replace')
+                for line in buf.split(b'\n')[skip:skip + count]]
+    
+    def close(self):
+        self._closed = True
+    
+    def _inflate(self, start):
+        """从解压后偏移 start 之前最近的检查点开始解压，产出 (数据块的解压后偏移, 数据块)"""
+        i = bisect.bisect_right(self._points, start) - 1
+        pos = self._points[i]
+        compressed, state = self._states[i]
+        decompressor = state.copy() if state else zlib.decompressobj(31)
+        with open(self.path, 'rb') as f:
+            f.seek(compressed)
+            while not self._closed:
+                raw = f.read(self.READ_SIZE)
+                if not raw:
+                    return
+                compressed += len(raw)
+                data = decompressor.decompress(raw)
+                while decompressor.eof and decompressor.unused_data:
+                    # 多成员 gzip：下一个成员接着解压
+                    rest = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+                    data += decompressor.decompress(rest)
+                metrics.count('file.bytes_read', len(raw))
+                if data:
+                    yield pos, data
+                    pos += len(data)
+                with self._lock:
+                    if pos >= self._points[-1] + self.CHECKPOINT_SIZE:
+                        self._points.append(pos)
+                        self._states.append((compressed, decompressor.copy()))
+    
+    def _load(self):
+        cached = load_index_cache(self._cache_path)
+        if cached is None:
+            return False
+        header, arrays = cached
+        try:
+            if header['version'] != self.VERSION or len(arrays) != 1:
+                return False
+            count, size = int(header['count']), int(header['size'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        self._offsets = arrays[0]
+        self._count = count
+        self.size = size
+        self.complete = True
+        return True
+    
+    def _save(self):
+        save_index_cache(self._cache_path, {'version': self.VERSION, 'count': self._count, 'size': self.size},
+                         [self._offsets])
+
+
+class ConcatenatedLog:
+    """按顺序拼接的多个日志文件（普通文件或 .gz 归档），作为一个虚拟日志按行访问
+    
+    接口与 LineIndex 相同（build/lines/len/complete/close），可直接交给虚拟化查看器；
+    各文件的索引依次建立，行号只在前面的文件都建立完成后才确定。
+    """
+    
+    def __init__(self, paths, cache_dir=CACHE_DIR):
+        self.paths = list(paths)
+        self.parts = [GzipLineIndex.open(path, cache_dir) if path.endswith('.gz') else LineIndex(path)
+                      for path in self.paths]
+        self._closed = False
+    
+    @property
+    def complete(self):
+        return all(part.complete for part in self.parts)
+    
+    def build(self):
+        for part in self.parts:
+            if self._closed:
+                return
+            part.build()
+    
+    def __len__(self):
+        total = 0
+        for part in self.parts:
+            total += len(part)
+            if not part.complete:
+                break
+        return total
+    
+    def lines(self, start, count):
+        """读取从第 start 行（从0开始）起的 count 行，可跨越文件边界"""
+        result = []
+        for part in self.parts:
+            if start < len(part):
+                result.extend(part.lines(start, count - len(result)))
+                if len(result) >= count:
+                    break
+                start = 0
+            else:
+                start -= len(part)
+            if not part.complete:
+                break
+        return result
+    
+    def close(self):
+        self._closed = True
+        for part in self.parts:
+            part.close()
+
+
+def _parse_records(data, base=0):
+    """解析一段按换行边界切分的日志字节，返回 (各列, 线程名列表, 行数)（在工作进程中执行）"""
+    header = LogRecords.HEADER_PATTERN
+    codes = LogRecords.LEVEL_CODES
+    columns = tuple(array(typecode) for typecode in LogRecords.TYPECODES)
+    offsets, lines, times, levels, threads, stamps, messages = columns
+    thread_ids = {}
+    
+    if base == 0 and data and not header.match(data):
+        # 文件开头没有日志头的内容（如崩溃报告正文）作为一条无级别记录
+        for column, value in zip(columns, (0, 0, -1, -1, -1, 0, 0)):
+            column.append(value)
+    
+    line, pos = 0, 0
+    for match in header.finditer(data):
+        start = match.start()
+        line += data.count(b'\n', pos, start)
+        pos = start
+        hours, minutes, seconds = match.group(2, 3, 4)
+        offsets.append(base + start)
+        lines.append(line)
+        times.append(int(hours) * 3600 + int(minutes) * 60 + int(seconds))
+        levels.append(codes.get(match.group(6).upper(), -1))
+        threads.append(thread_ids.setdefault(match.group(5), len(thread_ids)))
+        stamps.append(match.end(1) - start)
+        messages.append(match.end() - start)
+    
+    line_count = data.count(b'\n') + (1 if data and not data.endswith(b'\n') else 0)
+    names = [name.decode('utf-8', errors='replace') for name in thread_ids]
+    return columns, names, line_count
+
+
+def _parse_file_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return _parse_records(f.read(end - start), start)
+
+
+class LogRecords:
+    """结构化日志记录：每条记录是一行日志头（[时间] [线程/级别]: 消息）及其后的续行（如堆栈）
+    
+    字段按列存放在 array 中：起始偏移、首行行号、时间（当天秒数）、级别、线程，
+    以及时间戳和消息相对记录起点的长度。大文件按换行边界切块，由进程池并行解析。
+    """
+    
+    LEVELS = ('ERROR', 'WARN', 'INFO', 'DEBUG')
+    LEVEL_CODES = {b'FATAL': 0, b'ERROR': 0, b'WARN': 1, b'WARNING': 1,
+                   b'INFO': 2, b'DEBUG': 3, b'TRACE': 3}
+    # 兼容 [12:34:56] [Server thread/INFO]: 与 [14Mar2024 12:34:56.789] [main/INFO] [logger/]: 格式
+    HEADER_PATTERN = re.compile(
+        rb'^(\[[^\]\n]*?(\d{1,2}):(\d\d):(\d\d)[^\]\n]*\]) \[([^\]\n]*)/([A-Za-z]+)\](?:[^:\n]*?:)? ?',
+        re.MULTILINE)
+    COLUMNS = ('offsets', 'lines', 'times', 'levels', 'threads', 'stamps', 'messages')
+    TYPECODES = ('Q', 'I', 'i', 'b', 'i', 'H', 'I')
+    CHUNK_SIZE = 8 * 1024 * 1024
+    PARALLEL_THRESHOLD = 32 * 1024 * 1024
+    
+    def __init__(self):
+        for name, typecode in zip(self.COLUMNS, self.TYPECODES):
+            setattr(self, name, array(typecode))
+        self.thread_names = []
+        self.line_count = 0
+    
+    @classmethod
+    @metrics.timed('parse.records')
+    def parse_file(cls, path, max_workers=None):
+        """解析日志文件，大文件在进程池中分块并行解析"""
+        size = os.path.getsize(path)
+        if size <= cls.PARALLEL_THRESHOLD:
+            with open(path, 'rb') as f:
+                return cls._merge([_parse_records(f.read())])
+        
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = cls._chunk_bounds(mm, size)
+        with ProcessPoolExecutor(max_workers) as pool:
+            return cls._merge(pool.map(_parse_file_range, [path] * len(bounds), *zip(*bounds)))
+    
+    @classmethod
+    @metrics.timed('parse.records')
+    def from_bytes(cls, data, max_workers=None):
+        """解析内存中的日志字节"""
+        if len(data) <= cls.PARALLEL_THRESHOLD:
+            return cls._merge([_parse_records(data)])
+        
+        bounds = cls._chunk_bounds(data, len(data))
+        chunks = [data[start:end] for start, end in bounds]
+        with ProcessPoolExecutor(max_workers) as pool:
+            return cls._merge(pool.map(_parse_records, chunks, [start for start, end in bounds]))
+    
+    @classmethod
+    def from_text(cls, content):
+        return cls.from_bytes(content.encode('utf-8'))
+    
+    @classmethod
+    def _chunk_bounds(cls, buffer, size):
+        """按约 CHUNK_SIZE 切块，块边界总在换行之后"""
+        bounds, start = [], 0
+        while start < size:
+            newline = buffer.find(b'\n', min(start + cls.CHUNK_SIZE, size))
+            end = size if newline < 0 else newline + 1
+            bounds.append((start, end))
+            start = end
+        return bounds
+    
+    @classmethod
+    def _merge(cls, parts):
+        """按顺序合并各块的解析结果：行号加上前面各块的行数，线程名统一编号"""
+        records = cls()
+        names = {}
+        for columns, thread_names, line_count in parts:
+            base = records.line_count
+            remap = [names.setdefault(name, len(names)) for name in thread_names]
+            offsets, lines, times, levels, threads, stamps, messages = columns
+            if base:
+                lines = array('I', [line + base for line in lines])
+            threads = array('i', [remap[t] if t >= 0 else -1 for t in threads])
+            for name, column in zip(cls.COLUMNS, (offsets, lines, times, levels, threads, stamps, messages)):
+                getattr(records, name).extend(column)
+            records.line_count += line_count
+        records.thread_names = list(names)
+        return records
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def level(self, i):
+        code = self.levels[i]
+        return self.LEVELS[code] if code >= 0 else None
+    
+    def thread(self, i):
+        tid = self.threads[i]
+        return self.thread_names[tid] if tid >= 0 else None
+    
+    def record_at_line(self, line):
+        """第 line 行（从0开始）所属记录的序号"""
+        return bisect.bisect_right(self.lines, line) - 1
+    
+    def line_span(self, i):
+        """第 i 条记录占用的行 [首行, 末行+1)"""
+        end = self.lines[i + 1] if i + 1 < len(self.lines) else self.line_count
+        return self.lines[i], end
+    
+    def headers(self, first, last):
+        """第 first 到 last 行（从0开始，不含 last）中的日志头：[(行号, 时间戳长度, 级别), ...]"""
+        start = bisect.bisect_left(self.lines, first)
+        end = bisect.bisect_left(self.lines, last)
+        return [(self.lines[i], self.stamps[i], self.level(i))
+                for i in range(start, end) if self.stamps[i]]
+    
+    def level_lines(self, level):
+        """属于该级别记录的全部行号（包括堆栈等续行）"""
+        code = self.LEVELS.index(level)
+        result = array('I')
+        for i, value in enumerate(self.levels):
+            if value == code:
+                result.extend(range(*self.line_span(i)))
+        return result
+
+
+class SearchIndex:
+    """日志全文检索索引：行偏移、按级别的行号列表，以及按行块的词项倒排表
+    
+    索引以文件指纹（大小、修改时间与首尾样本的哈希）为键保存在缓存目录中，
+    再次打开同一文件时直接加载。
+    """
+    
+    VERSION = 4
+    LEVELS = LogRecords.LEVELS
+    TOKEN_PATTERN = re.compile(rb'[a-z0-9_$]{2,}')
+    # 纯数字（行号、坐标、时间等）数量庞大且区分度低，不进入词表
+    NUMBER_PATTERN = re.compile(rb'[0-9]+')
+    
+    def __init__(self, lines):
+        self.lines = lines
+        self.levels = {level: array('I') for level in self.LEVELS}
+        self.tokens = {}
+        self._sorted_tokens = None
+        self._reversed_tokens = None
+    
+    @classmethod
+    def open(cls, path, cache_dir=CACHE_DIR):
+        """打开文件的索引：缓存命中时直接加载，否则建立并保存"""
+        index = cls(LineIndex(path))
+        cache_path = os.path.join(cache_dir, 'index', cls.cache_key(path) + '.idx')
+        if index._load(cache_path):
+            metrics.count('cache.search_index.hit')
+        else:
+            metrics.count('cache.search_index.miss')
+            index.build()
+            try:
+                index._save(cache_path)
+            except OSError:
+                pass  # 索引写入失败不影响本次搜索
+        return index
+    
+    @classmethod
+    def from_text(cls, content, records=None):
+        """为内存中的文本建立索引（不保存），可复用已解析的结构化记录"""
+        index = cls(LineIndex(data=content.encode('utf-8')))
+        index.build(records)
+        return index
+    
+    @staticmethod
+    def cache_key(path, sample_size=64 * 1024):
+        """文件指纹：大小、修改时间与首尾样本的哈希"""
+        st = os.stat(path)
+        h = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode())
+        with open(path, 'rb') as f:
+            h.update(f.read(sample_size))
+            if st.st_size > sample_size:
+                f.seek(max(st.st_size - sample_size, sample_size))
+                h.update(f.read())
+        return h.hexdigest()
+    
+    @metrics.timed('search_index.build')
+    def build(self, records=None):
+        """各级别的行号取自结构化记录；词项按块扫描，每 STRIDE 行提取一次词项集合"""
+        self.lines.build()
+        data = self.lines.buffer
+        if records is None:
+            if self.lines.path:
+                records = LogRecords.parse_file(self.lines.path)
+            else:
+                records = LogRecords.from_bytes(data or b'')
+        self.levels = {level: records.level_lines(level) for level in self.LEVELS}
+        
+        number = self.NUMBER_PATTERN.fullmatch
+        for block in range(self.lines.block_count):
+            start, end = self.lines.block_range(block)
+            chunk = data[start:end]
+            for token in set(self.TOKEN_PATTERN.findall(chunk.lower())):
+                if number(token):
+                    continue
+                postings = self.tokens.get(token)
+                if postings is None:
+                    postings = self.tokens[token] = array('I')
+                postings.append(block)
+    
+    @metrics.timed('search_index.query')
+    def search(self, query, level=None):
+        """返回包含 query（不区分大小写）的行号列表（从0开始），可按级别过滤"""
+        needle = query.encode(self.lines.encoding, errors='replace')
+        if not needle:
+            return []
+        blocks = self._candidate_blocks(needle.lower())
+        if blocks is not None and not blocks:
+            return []
+        
+        # 在候选行块的原始字节上直接用正则查找（C层扫描），再换算为行号
+        pattern = re.compile(re.escape(needle), re.IGNORECASE)
+        data = self.lines.buffer
+        hits = []
+        for first, last in self._block_runs(blocks):
+            start, end = self.lines.block_range(first)[0], self.lines.block_range(last)[1]
+            line, pos = first * LineIndex.STRIDE, start
+            for match in pattern.finditer(data, start, end):
+                line += data[pos:match.start()].count(b'\n')
+                pos = match.start()
+                if not hits or hits[-1] != line:
+                    hits.append(line)
+        
+        if level:
+            level_lines = self.levels[level]
+            hits = [line for line in hits if self._sorted_contains(level_lines, line)]
+        return hits
+    
+    @staticmethod
+    def _sorted_contains(values, value):
+        i = bisect.bisect_left(values, value)
+        return i < len(values) and values[i] == value
+    
+    def _block_runs(self, blocks):
+        """将候选行块合并为连续区间 [(首块, 末块), ...]"""
+        if blocks is None:
+            return [(0, self.lines.block_count - 1)] if self.lines.block_count else []
+        runs = []
+        for block in sorted(blocks):
+            if runs and runs[-1][1] == block - 1:
+                runs[-1][1] = block
+            else:
+                runs.append([block, block])
+        return runs
+    
+    def _candidate_blocks(self, needle):
+        """用倒排表求可能包含 needle 的行块集合（None 表示无法缩小范围）"""
+        blocks = None
+        for match in self.TOKEN_PATTERN.finditer(needle):
+            term = match.group()
+            if self.NUMBER_PATTERN.fullmatch(term):
+                continue
+            
+            # 查询首尾的词项可能只是更长词项的一部分，按前缀/后缀/子串匹配词表
+            at_start, at_end = match.start() == 0, match.end() == len(needle)
+            if not (at_start or at_end):
+                postings = self.tokens.get(term, ())
+            else:
+                postings = set()
+                for token in self._tokens_matching(term, at_start, at_end):
+                    postings.update(self.tokens[token])
+            
+            blocks = set(postings) if blocks is None else blocks.intersection(postings)
+            if not blocks:
+                return set()
+        return blocks
+    
+    def _tokens_matching(self, term, suffix, prefix):
+        """词表中以 term 结尾（suffix）、开头（prefix）或包含 term（两者）的词项"""
+        if suffix and prefix:
+            return [t for t in self.tokens if term in t]
+        
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self.tokens)
+            self._reversed_tokens = sorted(t[::-1] for t in self.tokens)
+        if prefix:
+            words, key = self._sorted_tokens, term
+        else:
+            words, key = self._reversed_tokens, term[::-1]
+        
+        # 排序后的词表中，具有相同前缀的词项是连续的一段
+        found = []
+        for i in range(bisect.bisect_left(words, key), len(words)):
+            if not words[i].startswith(key):
+                break
+            found.append(words[i] if prefix else words[i][::-1])
+        return found
+    
+    def close(self):
+        self.lines.close()
+    
+    def _load(self, cache_path):
+        """缓存中各词项的倒排表首尾相接存为一个数组，另有一个数组记录各自的长度"""
+        cached = load_index_cache(cache_path)
+        if cached is None:
+            return False
+        header, arrays = cached
+        try:
+            if header['version'] != self.VERSION:
+                return False
+            levels, words = header['levels'], header['tokens']
+            offsets, lengths, postings = arrays[0], arrays[-2], arrays[-1]
+            if len(arrays) != len(levels) + 3 or len(lengths) != len(words):
+                return False
+            tokens, start = {}, 0
+            for word, length in zip(words, lengths):
+                tokens[word.encode('ascii')] = postings[start:start + length]
+                start += length
+            count = int(header['count'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        self.lines.restore(offsets, count)
+        self.levels = dict(zip(levels, arrays[1:-2]))
+        self.tokens = tokens
+        self._sorted_tokens = self._reversed_tokens = None
+        return True
+    
+    def _save(self, cache_path):
+        levels = list(self.levels)
+        words = list(self.tokens)
+        postings = array('I')
+        for word in words:
+            postings.extend(self.tokens[word])
+        header = {'version': self.VERSION, 'count': len(self.lines), 'levels': levels,
+                  'tokens': [word.decode('ascii') for word in words]}
+        arrays = ([self.lines._offsets] + [self.levels[level] for level in levels]
+                  + [array('I', [len(self.tokens[word]) for word in words]), postings])
+        save_index_cache(cache_path, header, arrays)
+
+
+class LocalAnalyzer:
+    """本地离线分析：用预编译的特征集单次遍历日志，识别常见故障"""
+    
+    # 所有加载器通用的特征（顺序即同一位置命中时的优先级）；exception 必须放在最后，见 _patterns_for
+    COMMON_PATTERNS = (
+        ('oom', r'java\.lang\.OutOfMemoryError'),
+        ('tick_lag', r"Can't keep up! Is the server overloaded\?"),
+        ('exception', r'\b(?:[a-z_$][\w$]*\.)+[A-Z][\w$]*(?:Exception|Error)\b(?=:|\s*$)'),
+    )
+    
+    # 各Mod加载器的依赖错误特征
+    LOADER_PATTERNS = {
+        'Fabric': (
+            r'Mod resolution (?:failed|encountered an incompatible mod set)',
+            r"requires .{0,160}?, which is missing",
+        ),
+        'Forge': (
+            r'Missing or unsupported mandatory dependencies',
+            r"Mod ID: '[\w.-]+', Requested by: '[\w.-]+'",
+        ),
+        'NeoForge': (
+            r'Missing or unsupported mandatory dependencies',
+            r"Mod ID: '[\w.-]+', Requested by: '[\w.-]+'",
+            r'Mod \S+ requires \S+ \S+ or above',
+        ),
+        'Quilt': (
+            r'Quilt Loader (?:could not|found) .{0,80}?problems?',
+            r"requires .{0,160}?, which is missing",
+        ),
+    }
+    
+    TICK_LAG_DETAIL = re.compile(r'Running (\d+)ms or (\d+) ticks behind')
+    SEVERITY = ('oom', 'dependency', 'exception', 'tick_lag')
+    
+    _compiled = {}
+    
+    def __init__(self, loader='Fabric'):
+        self.loader = loader
+        self.pattern, self.plain_pattern = self._patterns_for(loader)
+    
+    @classmethod
+    def _patterns_for(cls, loader):
+        """将通用特征与加载器特征合并为一个正则（按加载器缓存），返回 (完整正则, 不含异常特征的正则)
+        
+        异常特征要在每个位置尝试包名前缀，占了分析的大半时间；它只能匹配含 Exception/Error 的行，
+        其余行用不含它的正则即可，结果不变。
+        """
+        patterns = cls._compiled.get(loader)
+        if patterns is None:
+            kinds = [cls.COMMON_PATTERNS[0]]
+            kinds += [('dependency', regex) for regex in cls.LOADER_PATTERNS.get(loader, ())]
+            kinds += cls.COMMON_PATTERNS[1:]
+            patterns = cls._compiled[loader] = tuple(re.compile('|'.join(
+                f'(?P<{kind}{i}>{regex})' for i, (kind, regex) in enumerate(kinds)))
+                for kinds in (kinds, kinds[:-1]))
+        return patterns
+    
+    def analyze(self, content):
+        """分析完整的日志文本"""
+        return self.analyze_lines(content.split('\n'))
+    
+    def analyze_lines(self, lines, first_line=1):
+        """单次遍历日志行，返回按严重程度排序的问题列表"""
+        return self.sort_problems(self.collect(lines, first_line).values())
+    
+    @metrics.timed('analysis.collect')
+    def collect(self, lines, first_line=1):
+        """单次遍历日志行，返回未排序的 {问题键: 问题}，可与其他片段的结果合并"""
+        problems = {}
+        search, search_plain = self.pattern.search, self.plain_pattern.search
+        for number, line in enumerate(lines, first_line):
+            if 'Exception' in line or 'Error' in line:
+                match = search(line)
+            else:
+                match = search_plain(line)
+            if match is None:
+                continue
+            
+            kind = match.lastgroup.rstrip('0123456789')
+            if kind == 'exception':
+                key = f"exception:{match.group()}"
+                message = f"异常 {match.group()}"
+            elif kind == 'dependency':
+                key = f"dependency:{line.strip()}"
+                message = f"{self.loader} 依赖错误: {line.strip()[:200]}"
+            elif kind == 'oom':
+                key, message = kind, "内存不足 (java.lang.OutOfMemoryError)"
+            else:
+                key, message = kind, "服务器卡顿 (Can't keep up)"
+            
+            problem = problems.get(key)
+            if problem is None:
+                problem = problems[key] = {'type': kind, 'message': message,
+                                           'line': number, 'count': 0}
+            problem['count'] += 1
+            
+            if kind == 'tick_lag':
+                lag = self.TICK_LAG_DETAIL.search(line)
+                if lag:
+                    problem['max_lag_ms'] = max(problem.get('max_lag_ms', 0), int(lag.group(1)))
+        
+        return problems
+    
+    @staticmethod
+    def merge(into, problems, line_offset=0):
+        """按顺序合并片段的结果：次数累加，行号保留最早的一次"""
+        for key, problem in problems.items():
+            merged = into.get(key)
+            if merged is None:
+                merged = into[key] = dict(problem, line=problem['line'] + line_offset, count=0)
+            merged['count'] += problem['count']
+            if 'max_lag_ms' in problem:
+                merged['max_lag_ms'] = max(merged.get('max_lag_ms', 0), problem['max_lag_ms'])
+    
+    def sort_problems(self, problems):
+        return sorted(problems, key=lambda p: (self.SEVERITY.index(p['type']), p['line']))
+
+
+class IncrementalAnalyzer:
+    """增量本地分析：按内容切块并缓存每块的分析结果，编辑后只重新分析哈希变化的块
+    
+    块边界由行内容决定（行哈希的低位全为0处断开），插入或删除行只改变所在的块，
+    其后各块的内容与哈希不变，结果可以直接复用（块内行号是相对的）。
+    """
+    
+    def __init__(self, loader='Fabric', boundary_mask=0xFF, max_chunk_lines=2048):
+        self.analyzer = LocalAnalyzer(loader)
+        self.boundary_mask = boundary_mask
+        self.max_chunk_lines = max_chunk_lines
+        self._chunks = {}
+    
+    @property
+    def loader(self):
+        return self.analyzer.loader
+    
+    def split(self, lines):
+        """按内容定义的边界切块，返回 [(首行下标, 末行下标+1), ...]"""
+        mask = self.boundary_mask
+        bounds, start = [], 0
+        for i, line in enumerate(lines):
+            if hash(line) & mask == 0 or i + 1 - start >= self.max_chunk_lines:
+                bounds.append((start, i + 1))
+                start = i + 1
+        if start < len(lines):
+            bounds.append((start, len(lines)))
+        return bounds
+    
+    @metrics.timed('analysis.incremental')
+    def update(self, content):
+        """分析新内容，返回 (问题列表, 重新分析的块数, 总块数)"""
+        lines = content.split('\n')
+        previous, current = self._chunks, {}
+        merged = {}
+        bounds = self.split(lines)
+        changed = 0
+        for start, end in bounds:
+            chunk = lines[start:end]
+            key = hashlib.blake2b('\n'.join(chunk).encode('utf-8', errors='surrogatepass'),
+                                  digest_size=16).digest()
+            problems = current.get(key) or previous.get(key)
+            if problems is None:
+                problems = self.analyzer.collect(chunk)
+                changed += 1
+                metrics.count('analysis.chunk_miss')
+            else:
+                metrics.count('analysis.chunk_hit')
+            current[key] = problems
+            self.analyzer.merge(merged, problems, start)
+        
+        # 只保留当前内容的块，缓存大小随内容而定
+        self._chunks = current
+        return self.analyzer.sort_problems(merged.values()), changed, len(bounds)
+
+
+class LogTimeSeries:
+    """按分钟聚合的服务器运行指标：ERROR/WARN 数、卡顿（落后毫秒数）、玩家进出与保存耗时
+    
+    每个指标是以分钟为下标的一列 array（起点为 origin，本地时间的 Unix 分钟数），
+    可从 latest.log 与轮转归档流式构建，也可由监控的新行增量更新；
+    安装了 numpy 时 as_numpy() 返回 numpy 数组，便于进一步计算。
+    """
+    
+    COLUMNS = ('errors', 'warns', 'lag_events', 'lag_max_ms', 'joins', 'leaves', 'save_ms')
+    # 同一分钟内取最大值的列，其余列累加
+    MAX_COLUMNS = ('lag_max_ms', 'save_ms')
+    TYPECODE = 'i'
+    
+    HEADER_PATTERN = re.compile(r'\[[^\]\n]*?(\d{1,2}):(\d\d):(\d\d)[^\]\n]*\] \[[^\]\n]*/([A-Za-z]+)\]')
+    EVENT_PATTERN = re.compile(
+        r"Running (?P<lag>\d+)ms or \d+ ticks behind"
+        r"|\w (?P<join>joined) the game|\w (?P<leave>left) the game"
+        r"|(?P<save_start>Saving the game|Saving chunks for level)"
+        r"|(?P<save_end>Saved the game|All dimensions are saved)")
+    ARCHIVE_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})-\d+\.log\.gz$')
+    
+    def __init__(self):
+        self.origin = None
+        self.columns = {name: array(self.TYPECODE) for name in self.COLUMNS}
+        self._save_start = None
+    
+    def __len__(self):
+        return len(self.columns['errors'])
+    
+    @classmethod
+    @metrics.timed('timeseries.build')
+    def from_directory(cls, log_dir, days=7):
+        """按时间顺序流式读取目录中最近 days 天的轮转归档（YYYY-MM-DD-N.log.gz）与 latest.log"""
+        series = cls()
+        cutoff = time.strftime('%Y-%m-%d', time.localtime(time.time() - days * 86400))
+        for path in LogDirectoryIndex(log_dir).history(first=cutoff):
+            series.add_file(path)
+        return series
+    
+    @classmethod
+    def from_directories(cls, log_dirs, days=7):
+        """多个服务器的统计合并为一份（计数按分钟相加，最大值列取各服务器的最大值）"""
+        series = cls()
+        for log_dir in log_dirs:
+            series.update(cls.from_directory(log_dir, days))
+        return series
+    
+    def update(self, other):
+        """并入另一份统计（例如另一个服务器的）"""
+        columns = [other.columns[name] for name in self.COLUMNS]
+        buckets = {}
+        for i in range(len(other)):
+            values = [column[i] for column in columns]
+            if any(values):
+                buckets[i] = values
+        self._merge(buckets, other.origin)
+    
+    def add_file(self, path):
+        """读取一个日志文件；日期取自归档文件名，latest.log 则由修改日期和跨越的午夜数反推"""
+        self._save_start = None
+        with open_log_text(path) as f:
+            buckets, days = self._scan(f)
+        
+        match = self.ARCHIVE_DATE.match(os.path.basename(path))
+        if match:
+            start = self._midnight(*map(int, match.groups()))
+        else:
+            mtime = time.localtime(os.path.getmtime(path))
+            start = self._midnight(mtime.tm_year, mtime.tm_mon, mtime.tm_mday) - days * 1440
+        self._merge(buckets, start)
+    
+    def feed(self, lines, now=None):
+        """增量加入监控读到的新行（按当天日期；行时间晚于当前时间时视为前一天）"""
+        now = time.localtime(now)
+        today = self._midnight(now.tm_year, now.tm_mon, now.tm_mday)
+        seconds_now = now.tm_hour * 3600 + now.tm_min * 60 + now.tm_sec
+        buckets = self._scan(lines, day_of=lambda seconds: -1 if seconds > seconds_now + 60 else 0)[0]
+        self._merge(buckets, today)
+    
+    def _scan(self, lines, day_of=None):
+        """单次遍历日志行，返回 ({相对起始日的分钟: [各列的值]}, 跨越的午夜数)
+        
+        day_of 根据行时间给出所在日（相对起始日）；未提供时按时间倒退判断跨过午夜。
+        """
+        buckets = {}
+        header, events = self.HEADER_PATTERN, self.EVENT_PATTERN
+        day, last = 0, None
+        for line in lines:
+            match = header.match(line)
+            if match is None:
+                continue
+            hours, minutes, seconds = match.group(1, 2, 3)
+            seconds = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+            if day_of is not None:
+                day = day_of(seconds)
+            elif last is not None and seconds < last - 3600:
+                day += 1  # 时间倒退超过一小时：跨过了午夜
+            last = seconds
+            
+            minute = day * 1440 + seconds // 60
+            bucket = buckets.get(minute)
+            if bucket is None:
+                bucket = buckets[minute] = [0] * len(self.COLUMNS)
+            level = match.group(4).upper()
+            if level in ('ERROR', 'FATAL'):
+                bucket[0] += 1
+            elif level in ('WARN', 'WARNING'):
+                bucket[1] += 1
+            
+            event = events.search(line, match.end())
+            if event is None:
+                continue
+            kind = event.lastgroup
+            if kind == 'lag':
+                bucket[2] += 1
+                bucket[3] = max(bucket[3], int(event.group('lag')))
+            elif kind == 'join':
+                bucket[4] += 1
+            elif kind == 'leave':
+                bucket[5] += 1
+            elif kind == 'save_start':
+                # 关服时每个维度各有一条 Saving chunks，从第一条开始计时
+                if self._save_start is None:
+                    self._save_start = day * 86400 + seconds
+            elif self._save_start is not None:
+                # 日志时间只精确到秒，保存耗时同样按秒计
+                bucket[6] = max(bucket[6], (day * 86400 + seconds - self._save_start) * 1000)
+                self._save_start = None
+        return buckets, day
+    
+    def _merge(self, buckets, start):
+        if not buckets:
+            return
+        first, last = start + min(buckets), start + max(buckets)
+        self._extend(first, last)
+        columns = [(self.columns[name], name in self.MAX_COLUMNS) for name in self.COLUMNS]
+        for minute, values in buckets.items():
+            index = start + minute - self.origin
+            for (column, keep_max), value in zip(columns, values):
+                if keep_max:
+                    column[index] = max(column[index], value)
+                else:
+                    column[index] += value
+    
+    def _extend(self, first, last):
+        """保证 [first, last] 分钟都在列的范围内"""
+        if self.origin is None:
+            self.origin = first
+        if first < self.origin:
+            pad = array(self.TYPECODE, bytes(array(self.TYPECODE).itemsize * (self.origin - first)))
+            for name in self.COLUMNS:
+                self.columns[name] = pad + self.columns[name]
+            self.origin = first
+        missing = last - self.origin + 1 - len(self)
+        if missing > 0:
+            zeros = bytes(array(self.TYPECODE).itemsize * missing)
+            for column in self.columns.values():
+                column.frombytes(zeros)
+    
+    @staticmethod
+    def _midnight(year, month, day):
+        """本地时间当天零点的 Unix 分钟数"""
+        return int(time.mktime((year, month, day, 0, 0, 0, 0, 0, -1))) // 60
+    
+    def tail(self, minutes):
+        """最近 minutes 分钟的数据，返回 (起始分钟, {指标: 列表})"""
+        start = max(0, len(self) - minutes)
+        return (self.origin or 0) + start, {name: column[start:].tolist()
+                                            for name, column in self.columns.items()}
+    
+    def as_numpy(self):
+        """各列转换为 numpy 数组（未安装 numpy 时返回 array 的副本）"""
+        try:
+            import numpy
+        except ImportError:
+            return {name: array(self.TYPECODE, column) for name, column in self.columns.items()}
+        return {name: numpy.frombuffer(column, dtype=numpy.int32).copy()
+                for name, column in self.columns.items()}
+
+
+class PersistentLRUCache:
+    """持久化到磁盘的LRU缓存，支持条目数上限与过期时间(TTL)"""
+    
+    def __init__(self, path, max_entries=500, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._load()
+    
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        # 文件中按最近使用顺序保存，加载时丢弃已过期的条目
+        for key, entry in data:
+            if now - entry['time'] < self.ttl:
+                self._entries[key] = entry
+    
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self._entries.items()), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+    
+    def get(self, key):
+        """命中时返回缓存值并刷新其LRU位置，否则返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry['time'] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                metrics.count(f'cache.{self.name}.miss')
+                return None
+            metrics.count(f'cache.{self.name}.hit')
+            self._entries.move_to_end(key)
+            return entry['value']
+    
+    def put(self, key, value):
+        """写入缓存，超出上限时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = {'time': time.time(), 'value': value}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError:
+                pass  # 缓存写入失败不影响正常使用
+
+
+class ApiClient:
+    """共享的HTTP客户端：连接池与keep-alive复用，429/5xx时自动退避重试"""
+    
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    
+    def __init__(self, base_url=DEFAULT_API_BASE, timeout=30, retries=3,
+                 backoff=0.5, pool_size=10):
+        # 延迟导入：无需联网的命令不必加载 requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        
+        # allowed_methods=None 表示POST同样重试（服务端限流或故障时请求并未被处理）
+        retry = Retry(total=retries, backoff_factor=backoff,
+                      status_forcelist=self.RETRY_STATUS, allowed_methods=None,
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def configure(self, base_url=None, timeout=None):
+        """更新API地址与超时设置（连接池保持不变）"""
+        if base_url:
+            self.base_url = base_url.rstrip('/')
+        if timeout:
+            self.timeout = timeout
+    
+    def url(self, path):
+        """将相对路径拼接为完整URL"""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+    
+    @metrics.timed('http.request')
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except Exception:
+            metrics.count('http.errors')
+            raise
+        metrics.count(f'http.status.{response.status_code}')
+        metrics.count('http.bytes_received', len(response.content))
+        return response
+    
+    def post_log(self, body, compressed=False):
+        """上传日志，body 为已编码的表单数据（字节块的可迭代对象）"""
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        return self.request('POST', '/log', data=body, headers=headers)
+
+
+def open_log_text(path):
+    """以文本方式打开日志，.gz 归档自动解压"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding=detect_encoding(path), errors='replace')
+
+
+def iter_log_lines(path):
+    """逐行流式读取日志（不含换行符），.gz 归档自动解压"""
+    with open_log_text(path) as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def iter_logs_lines(paths):
+    """按顺序逐行读取多个日志文件，相当于读取它们拼接后的内容"""
+    for path in paths:
+        yield from iter_log_lines(path)
+
+
+class StreamBody:
+    """可重复迭代的请求体：每次迭代重新生成数据流，重试时也能完整重发"""
+    
+    def __init__(self, factory):
+        self.factory = factory
+    
+    def __iter__(self):
+        for chunk in self.factory():
+            metrics.count('http.bytes_sent', len(chunk))
+            yield chunk
+
+
+class Redactor:
+    """上传前隐藏个人信息：IPv4/IPv6 地址、UUID、玩家名与用户主目录中的用户名
+    
+    文本按批扫描：先用一个以少见字符（. - : / \\）开头的组合正则在C层快速找出可能含隐私的行，
+    只对这些行应用完整规则，不含隐私的行原样保留。玩家名从登录记录中学到，之后在该日志中
+    按名字整批替换为 Player1、Player2……（同一玩家始终对应同一代号）。
+    每个日志流应使用新的实例，相同内容两次脱敏的结果完全一致。
+    """
+    
+    IPV4_MASK = "**.**.**.**"
+    IPV6_MASK = "****:****:****:****"
+    UUID_MASK = "********-****-****-****-************"
+    
+    # 回环与通配地址不含隐私，保留以便排查端口绑定等问题
+    KEEP_ADDRESSES = frozenset(('127.0.0.1', '0.0.0.0'))
+    
+    # 候选行的特征，每条都以日志中较少见的字符开头（登录记录总带有IP或UUID，无需单列）
+    TRIGGERS = re.compile(
+        r'(?:\.\d{1,3}\.\d{1,3}\.\d'
+        r'|-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-'
+        r'|::|:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}:'
+        r'|/home/|/Users/|\\Users\\)')
+    
+    # 合法的四段地址默认一律隐藏，只有能确认是版本号时才保留（宁可多遮也不漏）：
+    # 紧跟在版本/加载器关键字或 - + _ 之后（Java 17.0.10.7、mc1.20.1-1.2.3.4）、
+    # 带 -beta / +mc1.20 这类构建后缀，或位于Mod列表行中（\t- sodium 0.5.8.1、\t\tsodium: Sodium 0.5.8.1）
+    VERSION_BEFORE = re.compile(
+        r'(?:[-+_]|\b(?:version|ver|java|jre|jdk|jvm|minecraft|mc|forge|neoforge|fabric|quilt|loader'
+        r'|optifine|build|release)[\s:=]+)\Z', re.IGNORECASE)
+    VERSION_AFTER = re.compile(r'[-+]\w')
+    MOD_LIST_LINE = re.compile(r'\s+(?:- |\| )|\t\t[\w.-]+: ')
+    
+    RULES = re.compile('|'.join((
+        r'(?P<ipv4>(?<![\w.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\d.]))',
+        r'(?P<ipv6>(?<![\w:])(?:(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}'
+        r'|(?:[0-9A-Fa-f]{1,4}:){1,6}:(?:[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4}){0,5})?)(?![\w:]))',
+        r'(?P<uuid>(?<![\w-])[0-9A-Fa-f]{8}(?:-[0-9A-Fa-f]{4}){3}-[0-9A-Fa-f]{12}(?![\w-]))',
+        r'(?P<home>(?:/home/|/Users/|[A-Za-z]:[\\/]+Users[\\/]+))(?P<user>[^/\\\s]+)',
+        # 原版服务器的登录记录：UUID of player X is ... / X[/ip:port] logged in ...
+        r'(?P<join>(?<=UUID of player )\w{3,16}|(?<![\w<])\w{3,16}(?=\[/))',
+    )))
+    
+    def __init__(self):
+        self.players = {}
+        self._names = None
+    
+    def redact(self, text):
+        """脱敏一段文本（应按行边界切分，规则不跨行）"""
+        known = len(self.players)
+        parts, last = [], 0
+        for match in self.TRIGGERS.finditer(text):
+            if match.start() < last:
+                continue  # 所在行已处理
+            start = text.rfind('\n', 0, match.start()) + 1
+            end = text.find('\n', match.end())
+            if end < 0:
+                end = len(text)
+            parts.append(text[last:start])
+            parts.append(self.RULES.sub(self._replace, text[start:end]))
+            last = end
+        if parts:
+            parts.append(text[last:])
+            text = ''.join(parts)
+        
+        if len(self.players) != known:
+            names = '|'.join(re.escape(name) for name in sorted(self.players, key=len, reverse=True))
+            self._names = re.compile(rf'(?<!\w)(?:{names})(?!\w)')
+        if self._names is not None:
+            # 聊天、死亡消息等处的玩家名（包括本批中早于登录记录出现的）
+            text = self._names.sub(self._alias_match, text)
+        return text
+    
+    def redact_lines(self, lines, batch_lines=4096):
+        """流式脱敏行迭代器：每批行拼接后整体扫描一次"""
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= batch_lines:
+                yield from self.redact('\n'.join(batch)).split('\n')
+                batch = []
+        if batch:
+            yield from self.redact('\n'.join(batch)).split('\n')
+    
+    def _replace(self, match):
+        kind = match.lastgroup
+        if kind == 'ipv4':
+            value = match.group()
+            if value in self.KEEP_ADDRESSES or self._is_version(match):
+                return value
+            return self.IPV4_MASK
+        if kind == 'ipv6':
+            return self.IPV6_MASK
+        if kind == 'uuid':
+            return self.UUID_MASK
+        if kind == 'user':
+            return match.group('home') + 'user'
+        return self._alias_match(match)
+    
+    def _is_version(self, match):
+        line, start, end = match.string, match.start(), match.end()
+        if self.VERSION_BEFORE.search(line, max(0, start - 12), start):
+            return True
+        if self.VERSION_AFTER.match(line, end):
+            return True
+        return self.MOD_LIST_LINE.match(line) is not None
+    
+    def _alias_match(self, match):
+        name = match.group()
+        alias = self.players.get(name)
+        if alias is None:
+            alias = self.players[name] = f"Player{len(self.players) + 1}"
+        return alias
+
+
+class UploadPipeline:
+    """上传前的流式处理：隐私脱敏、智能裁剪、表单编码与可选的gzip压缩，全程不持有完整日志"""
+    
+    KEEP_LEVELS = ('ERROR', 'WARN')
+    
+    def __init__(self, head_lines=1000, tail_lines=10000, context_lines=10,
+                 compress=False, chunk_chars=64 * 1024, redact=True):
+        self.head_lines = head_lines
+        self.tail_lines = max(tail_lines, context_lines)
+        self.context_lines = context_lines
+        self.compress = compress
+        self.chunk_chars = chunk_chars
+        self.redact = redact
+    
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings['trim_head_lines'], settings['trim_tail_lines'],
+                   settings['trim_context_lines'], settings['compress_uploads'],
+                   redact=settings['redact_uploads'])
+    
+    def trim(self, lines):
+        """保留开头（启动与Mod列表）、结尾（崩溃）以及每个 ERROR/WARN 块及其上下文"""
+        window = deque()   # 最近 tail_lines 行：[行号, 内容, 是否保留]
+        last_emitted = -1
+        after = 0          # 块结束后还需保留的下文行数
+        in_block = False
+        
+        for index, line in enumerate(lines):
+            if index < self.head_lines:
+                yield line
+                last_emitted = index
+                continue
+            
+            match = LOG_LINE_PATTERN.match(line)
+            level = (match.group('level') or '').upper()
+            if level in self.KEEP_LEVELS:
+                keep = in_block = True
+                after = self.context_lines
+                # 上文仍在窗口中，补记为保留（从尾部取，不复制整个窗口）
+                for entry in islice(reversed(window), self.context_lines):
+                    entry[2] = True
+            elif in_block and match.end('timestamp') < 0:
+                keep = True  # 堆栈等续行属于同一块
+            else:
+                in_block = False
+                keep = after > 0
+                after = max(after - 1, 0)
+            
+            window.append([index, line, keep])
+            if len(window) > self.tail_lines:
+                index, line, keep = window.popleft()
+                if keep:
+                    if index - last_emitted > 1:
+                        yield f"... (省略 {index - last_emitted - 1} 行) ..."
+                    yield line
+                    last_emitted = index
+        
+        for index, line, keep in window:
+            if index - last_emitted > 1:
+                yield f"... (省略 {index - last_emitted - 1} 行) ..."
+            yield line
+            last_emitted = index
+    
+    def text_chunks(self, lines):
+        """将脱敏、裁剪后的行合并为约 chunk_chars 大小的文本块"""
+        # 先脱敏整个日志再裁剪，玩家名能从被裁掉的登录记录中学到
+        if self.redact:
+            lines = Redactor().redact_lines(lines)
+        buf, size, first = [], 0, True
+        for line in self.trim(lines):
+            buf.append(line)
+            size += len(line) + 1
+            if size >= self.chunk_chars:
+                yield ('' if first else '\n') + '\n'.join(buf)
+                buf, size, first = [], 0, False
+        if buf:
+            yield ('' if first else '\n') + '\n'.join(buf)
+    
+    @metrics.timed('upload.prepare')
+    def prepare(self, source):
+        """脱敏、裁剪一次，同时计算哈希（用作上传缓存键）并暂存结果，请求体直接读取暂存内容"""
+        h = hashlib.sha256()
+        spool = tempfile.SpooledTemporaryFile(PreparedLog.MEMORY_LIMIT)
+        try:
+            for chunk in self.text_chunks(self._lines(source)):
+                data = chunk.encode('utf-8', errors='replace')
+                h.update(data)
+                spool.write(data)
+        except BaseException:
+            spool.close()
+            raise
+        return PreparedLog(h.hexdigest(), spool)
+    
+    def body(self, prepared, compress=None):
+        """构造流式请求体（按块编码与压缩，不在内存中拼接完整内容）"""
+        compress = self.compress if compress is None else compress
+        return StreamBody(lambda: self._emit(prepared, compress))
+    
+    def _emit(self, prepared, compress):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        for data in self._form_chunks(prepared):
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+    
+    def _form_chunks(self, prepared):
+        yield b'content='
+        for data in prepared.chunks(self.chunk_chars):
+            yield quote_plus(data).encode('ascii')
+    
+    @staticmethod
+    def _lines(source):
+        """source 为文本内容，或返回行迭代器的函数"""
+        return source.split('\n') if isinstance(source, str) else source()
+
+
+class PreparedLog:
+    """UploadPipeline.prepare 的结果：内容哈希与暂存的上传文本（超过 MEMORY_LIMIT 时落盘）
+    
+    请求体每次从头读取暂存内容，重试或改为不压缩重发时不必重新脱敏、裁剪。用完后应关闭。
+    """
+    
+    MEMORY_LIMIT = 8 * 1024 * 1024
+    
+    def __init__(self, digest, spool):
+        self.digest = digest
+        self.spool = spool
+    
+    def chunks(self, size):
+        self.spool.seek(0)
+        while True:
+            data = self.spool.read(size)
+            if not data:
+                return
+            yield data
+    
+    def close(self):
+        self.spool.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class UploadError(Exception):
+    """上传失败（服务器返回错误状态）"""
+
+
+class InsightsError(Exception):
+    """获取分析结果失败（服务器返回错误状态或 success 为 false）"""
+
+
+class LogUploader:
+    """上传日志到 mclo.gs，内容哈希命中缓存时不发起网络请求
+    
+    source 可以是文本内容，也可以是返回行迭代器的函数（用于流式读取文件）。
+    缓存键包含API端点：切换端点（例如本地模拟服务器）后不会拿到另一个端点的链接。
+    """
+    
+    # 服务端不接受压缩请求体时的状态码
+    UNSUPPORTED_ENCODING_STATUS = (400, 411, 415)
+    
+    def __init__(self, api, cache=None, pipeline=None):
+        self.api = api
+        self.cache = cache
+        self.pipeline = pipeline or UploadPipeline()
+        self._plain_hosts = set()
+    
+    def prepare(self, source):
+        """脱敏、裁剪一次，返回 (PreparedLog, 缓存的上传结果或None)"""
+        prepared = self.pipeline.prepare(source)
+        return prepared, (self.cache.get(self._key(prepared.digest)) if self.cache else None)
+    
+    def post(self, prepared):
+        """实际上传准备好的内容，成功的结果写入缓存"""
+        host = urlparse(self.api.base_url).netloc
+        compress = self.pipeline.compress and host not in self._plain_hosts
+        response = self.api.post_log(self.pipeline.body(prepared, compress), compress)
+        if compress and response.status_code in self.UNSUPPORTED_ENCODING_STATUS:
+            # 端点不支持gzip请求体，记住后改为不压缩重发
+            self._plain_hosts.add(host)
+            response = self.api.post_log(self.pipeline.body(prepared, False))
+        if response.status_code != 200:
+            raise UploadError(f"API错误: {response.status_code}")
+        
+        result = response.json()
+        if result.get('success') and self.cache:
+            self.cache.put(self._key(prepared.digest), result)
+        return result
+    
+    def _key(self, digest):
+        return f"{self.api.base_url} {digest}"
+    
+    def upload(self, source):
+        """上传日志（相同内容直接返回缓存结果）"""
+        return self.upload_digest(source)[1]
+    
+    @metrics.timed('upload.total')
+    def upload_digest(self, source):
+        """上传日志，返回 (内容哈希, 上传结果)，内容哈希可用于缓存后续的分析结果"""
+        prepared, result = self.prepare(source)
+        with prepared:
+            if result is None:
+                result = self.post(prepared)
+        return prepared.digest, result
+    
+    def upload_file(self, path):
+        """流式上传日志文件"""
+        return self.upload(lambda: iter_log_lines(path))
+
+
+class InsightsFetcher:
+    """获取 mclo.gs 对已上传日志的分析结果（GET /insights/{id}）
+    
+    结果按API端点与日志ID缓存，并记下对应的内容哈希：同一ID对应的内容变了时不使用旧结果，
+    内容相同但ID不同时按内容哈希命中。切换最近的日志或重新打开分享链接都不再请求API。
+    """
+    
+    def __init__(self, api, cache=None):
+        self.api = api
+        self.cache = cache
+    
+    def cached(self, log_id, digest=None):
+        """缓存的分析结果，没有时返回 None"""
+        if self.cache is None:
+            return None
+        entry = self.cache.get(self._key(log_id))
+        if entry is not None and (digest is None or entry['digest'] in (None, digest)):
+            return entry['insights']
+        if digest:
+            entry = self.cache.get(self._key('sha256:' + digest))
+            if entry is not None:
+                return entry['insights']
+        return None
+    
+    @metrics.timed('insights.fetch')
+    def fetch(self, log_id, digest=None):
+        """获取分析结果（命中缓存时不发起请求）"""
+        insights = self.cached(log_id, digest)
+        if insights is not None:
+            return insights
+        
+        response = self.api.request('GET', f'/insights/{log_id}')
+        if response.status_code != 200:
+            raise InsightsError(f"API错误: {response.status_code}")
+        insights = response.json()
+        if insights.get('success') is False:
+            raise InsightsError(insights.get('error', "获取分析结果失败"))
+        
+        if self.cache is not None:
+            entry = {'digest': digest, 'insights': insights}
+            self.cache.put(self._key(log_id), entry)
+            if digest:
+                self.cache.put(self._key('sha256:' + digest), entry)
+        return insights
+    
+    def _key(self, name):
+        return f"{self.api.base_url} {name}"
+    
+    @staticmethod
+    def problems(insights):
+        """整理为 [(问题描述, 次数, 行号或None, [解决方案, ...]), ...]"""
+        result = []
+        for problem in insights.get('analysis', {}).get('problems', []):
+            lines = (problem.get('entry') or {}).get('lines') or [{}]
+            result.append((problem.get('message', ''), problem.get('counter', 1), lines[0].get('number'),
+                           [solution.get('message', '') for solution in problem.get('solutions', [])]))
+        return result
+    
+    @staticmethod
+    def information(insights):
+        """整理为 [(名称, 值), ...]"""
+        return [(info.get('label', ''), info.get('value', info.get('message', '')))
+                for info in insights.get('analysis', {}).get('information', [])]
+
+
+class CrashClusterIndex:
+    """按堆栈指纹聚类崩溃报告的本地索引（持久化为JSON）
+    
+    指纹取自描述行、异常行与每个异常的前 MAX_FRAMES 个调用帧，先去掉行号、地址、时间、
+    lambda/动态类后缀等每次运行都会变化的部分再哈希，新报告按指纹 O(1) 找到所属的簇。
+    每个簇只需上传一份代表报告，同类报告直接复用其链接。
+    """
+    
+    HEADER = "---- Minecraft Crash Report ----"
+    MAX_FRAMES = 12
+    MAX_MEMBERS = 20
+    
+    EXCEPTION_PATTERN = re.compile(
+        r'^(?:Caused by: )?(?:[A-Za-z_$][\w$]*\.)+[\w$]*(?:Exception|Error|Throwable)\b')
+    FRAME_PATTERN = re.compile(r'^\s+at\s+(?:[\w.]+(?:@[\w.]+)?/)?([^\s(]+)')
+    FRAME_RULES = (
+        (re.compile(r'\$\$Lambda\$\d+(?:/0x[0-9a-fA-F]+)?'), '$$Lambda'),
+        (re.compile(r'lambda\$(\w+?)\$\d+'), r'lambda$\1'),
+        (re.compile(r'(handler|redirect|wrapOperation|modify\w*)\$[0-9a-z]+\$'), r'\1$'),
+        (re.compile(r'(GeneratedMethodAccessor|GeneratedConstructorAccessor)\d+'), r'\1'),
+        (re.compile(r'/0x[0-9a-fA-F]+'), ''),
+    )
+    MESSAGE_RULES = (
+        (re.compile(r'[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}'), '<uuid>'),
+        (re.compile(r'0x[0-9a-fA-F]+|@[0-9a-fA-F]{4,}\b'), '<addr>'),
+        (re.compile(r'\d+'), '#'),
+    )
+    
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.clusters = json.load(f)
+        except (OSError, ValueError):
+            self.clusters = {}
+    
+    @classmethod
+    def fingerprint(cls, lines):
+        """返回 (指纹, 规范化后的签名行)；不是崩溃报告或没有堆栈时返回 (None, [])"""
+        lines = iter(lines)
+        if next(lines, '').strip() != cls.HEADER:
+            return None, []
+        
+        signature, frames, started = [], 0, False
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if not started:
+                if line.startswith('Description: '):
+                    signature.append(cls._normalize_message(line))
+                elif cls.EXCEPTION_PATTERN.match(line):
+                    started = True
+                    signature.append(cls._normalize_message(line))
+                continue
+            
+            frame = cls.FRAME_PATTERN.match(line)
+            if frame:
+                if frames < cls.MAX_FRAMES:
+                    signature.append('at ' + cls._normalize_frame(frame.group(1)))
+                frames += 1
+            elif cls.EXCEPTION_PATTERN.match(line):
+                signature.append(cls._normalize_message(line))
+                frames = 0
+            elif not line.strip():
+                break  # 第一段堆栈结束（之后是详细信息与系统信息）
+        
+        if not started:
+            return None, []
+        digest = hashlib.blake2b('\n'.join(signature).encode('utf-8'), digest_size=16).hexdigest()
+        return digest, signature
+    
+    @classmethod
+    def _normalize_frame(cls, frame):
+        for pattern, replacement in cls.FRAME_RULES:
+            frame = pattern.sub(replacement, frame)
+        return frame
+    
+    @classmethod
+    def _normalize_message(cls, line):
+        for pattern, replacement in cls.MESSAGE_RULES:
+            line = pattern.sub(replacement, line)
+        return line
+    
+    def add(self, lines, path):
+        """把报告归入所属的簇，返回 (指纹, 簇)；不是崩溃报告时返回 (None, None)
+        
+        同一路径重复加入（例如上传失败后重新运行批量上传）不会重复计数。
+        """
+        key, signature = self.fingerprint(lines)
+        if key is None:
+            return None, None
+        now = time.time()
+        with self._lock:
+            cluster = self.clusters.get(key)
+            if cluster is None:
+                cluster = self.clusters[key] = {
+                    'title': signature[1] if signature[0].startswith('Description: ') else signature[0],
+                    'signature': signature, 'count': 0, 'first_seen': now, 'members': []}
+            if path not in cluster['members']:
+                cluster['count'] += 1
+                cluster['last_seen'] = now
+                cluster['members'] = (cluster['members'] + [path])[-self.MAX_MEMBERS:]
+            return key, dict(cluster)
+    
+    def add_file(self, path):
+        with open_log_text(path) as f:
+            return self.add(f, path)
+    
+    def record_upload(self, key, path, result):
+        """记录簇的代表报告及其上传结果（只记录成功的上传）"""
+        if key is None or not result.get('success'):
+            return
+        with self._lock:
+            cluster = self.clusters.get(key)
+            if cluster is not None and 'url' not in cluster:
+                cluster['representative'] = path
+                cluster['id'] = result['id']
+                cluster['url'] = result.get('url', f"https://mclo.gs/{result['id']}")
+    
+    def save(self):
+        """写入索引文件（先写临时文件再替换）"""
+        with self._lock:
+            data = json.dumps(self.clusters, ensure_ascii=False, indent=2)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+
+class RateLimiter:
+    """令牌桶限速：平均每秒最多 rate 次，允许 burst 次突发"""
+    
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """阻塞直到获得一个令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class BatchUploader:
+    """批量上传目录树中的日志：有界线程池并发、按主机限速、结果写入清单
+    
+    提供 clusters（CrashClusterIndex）时，同一堆栈指纹的崩溃报告只上传一份代表，其余复用其链接。
+    """
+    
+    EXTENSIONS = ('.log', '.txt', '.log.gz')
+    MANIFEST_NAME = '.mclogs_manifest.json'
+    
+    def __init__(self, uploader, max_workers=4, rate_per_host=2.0, clusters=None):
+        self.uploader = uploader
+        self.max_workers = max_workers
+        self.rate_per_host = rate_per_host
+        self.clusters = clusters
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+    
+    def find_files(self, root):
+        """遍历目录树，返回所有日志文件路径"""
+        found = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in filenames:
+                if name.endswith(self.EXTENSIONS):
+                    found.append(os.path.join(dirpath, name))
+        return sorted(found)
+    
+    def run(self, root, progress=None):
+        """上传 root 下所有未完成的日志，返回 (清单路径, 成功数, 失败数, 跳过数)"""
+        manifest_path = os.path.join(root, self.MANIFEST_NAME)
+        manifest = self._load_manifest(manifest_path)
+        
+        pending, skipped = [], 0
+        for path in self.find_files(root):
+            rel = os.path.relpath(path, root)
+            if self._is_done(manifest.get(rel), path):
+                skipped += 1
+            else:
+                pending.append((rel, path))
+        
+        uploads, followers, duplicates = self._group_by_cluster(pending)
+        done = succeeded = failed = 0
+        
+        def record(rel, entry):
+            nonlocal done, succeeded, failed
+            manifest[rel] = entry
+            done += 1
+            if 'error' in entry:
+                failed += 1
+            else:
+                succeeded += 1
+            if progress:
+                progress(done, len(pending), rel, entry)
+            # 定期保存，中断后重新运行也能跳过已完成的文件
+            if done % 20 == 0:
+                self._save_manifest(manifest_path, manifest)
+        
+        for rel, entry in duplicates:
+            record(rel, entry)
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='batch-upload') as pool:
+            futures = {}
+            for rel, path, key in uploads:
+                futures[pool.submit(self._upload_one, path)] = (rel, path, key)
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    rel, path, key = futures.pop(future)
+                    entry = future.result()
+                    record(rel, entry)
+                    if key is None:
+                        continue
+                    members = followers.pop(key, [])
+                    if 'id' not in entry:
+                        # 代表报告上传失败：由同簇的下一份报告接替上传
+                        if members:
+                            followers[key] = members[1:]
+                            member_rel, member_path = members[0]
+                            futures[pool.submit(self._upload_one, member_path)] = (member_rel, member_path, key)
+                        continue
+                    # 代表报告完成后，同簇的其他报告复用它的结果
+                    self.clusters.record_upload(key, path, dict(entry, success=True))
+                    for member_rel, member_path in members:
+                        record(member_rel, self._duplicate_entry(member_path, entry['id'], entry['url'], rel))
+        
+        if self.clusters is not None:
+            self.clusters.save()
+        self._save_manifest(manifest_path, manifest)
+        return manifest_path, succeeded, failed, skipped
+    
+    def _group_by_cluster(self, pending):
+        """按崩溃指纹分组，返回 (需要上传的 [(rel, 路径, 指纹)], {指纹: [同簇待定的 (rel, 路径)]},
+        已有上传结果的簇中的 [(rel, 清单条目)])"""
+        if self.clusters is None:
+            return [(rel, path, None) for rel, path in pending], {}, []
+        
+        uploads, followers, duplicates = [], {}, []
+        for rel, path in pending:
+            try:
+                key, cluster = self.clusters.add_file(path)
+            except OSError:
+                key, cluster = None, None
+            if key is None:
+                uploads.append((rel, path, None))
+            elif 'url' in cluster:
+                duplicates.append((rel, self._duplicate_entry(
+                    path, cluster['id'], cluster['url'], cluster['representative'])))
+            elif key in followers:
+                followers[key].append((rel, path))
+            else:
+                followers[key] = []
+                uploads.append((rel, path, key))
+        return uploads, followers, duplicates
+    
+    @staticmethod
+    def _duplicate_entry(path, log_id, url, representative):
+        """同类报告的清单条目（指向代表报告的上传结果）"""
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            return {'error': str(e)}
+        return {'size': st.st_size, 'mtime': st.st_mtime, 'id': log_id, 'url': url,
+                'duplicate_of': representative}
+    
+    def _upload_one(self, path):
+        """上传单个文件，返回清单条目"""
+        try:
+            st = os.stat(path)
+            entry = {'size': st.st_size, 'mtime': st.st_mtime}
+            source = lambda: iter_log_lines(path)
+            prepared, result = self.uploader.prepare(source)
+            with prepared:
+                entry['hash'] = prepared.digest
+                if result is None:
+                    self._limiter().acquire()
+                    result = self.uploader.post(prepared)
+            if not result.get('success'):
+                entry['error'] = result.get('error', "上传失败")
+                return entry
+            
+            entry['id'] = result['id']
+            entry['url'] = result.get('url', f"https://mclo.gs/{result['id']}")
+            return entry
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def _limiter(self):
+        host = urlparse(self.uploader.api.base_url).netloc
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate_per_host)
+            return limiter
+    
+    @staticmethod
+    def _is_done(entry, path):
+        """清单中已有成功记录且文件未变化"""
+        if not entry or 'id' not in entry:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return entry.get('size') == st.st_size and entry.get('mtime') == st.st_mtime
+    
+    @staticmethod
+    def _load_manifest(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def _save_manifest(path, manifest):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class JobQueueFull(Exception):
+    """后台任务过多，拒绝新任务"""
+
+
+class JobQueue:
+    """有界并发的后台任务队列：同一键的新任务取代旧任务（最新者优先）
+    
+    被取代的任务若尚未开始则直接取消，已在运行的任务完成后丢弃其结果。
+    排队与运行中的任务总数超过 max_pending 时拒绝新任务。
+    """
+    
+    def __init__(self, max_workers=3, max_pending=16, on_change=None):
+        self.max_pending = max_pending
+        self.on_change = on_change  # 队列深度变化时调用（可能在工作线程中）
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.RLock()  # 取消任务时完成回调会在持锁期间同步执行
+        self._latest = {}  # 键 -> 未完成的最新任务
+        self._superseded = weakref.WeakSet()
+        self._pending = 0
+    
+    @property
+    def depth(self):
+        """排队与运行中的任务数"""
+        return self._pending
+    
+    def submit(self, key, fn, *args, on_done=None):
+        """提交任务；key 为 None 的任务互不取代。on_done(future) 只对最新任务调用"""
+        with self._lock:
+            # 先检查容量：拒绝新任务时旧任务保持不变，仍会交付结果
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"后台任务过多 ({self._pending})")
+            
+            previous = self._latest.get(key) if key is not None else None
+            future = self._executor.submit(fn, *args)
+            if key is not None:
+                self._latest[key] = future
+            self._pending += 1
+            future.add_done_callback(lambda f: self._done(key, f, on_done))
+            if previous is not None:
+                self._superseded.add(previous)
+                previous.cancel()
+        self._notify()
+        return future
+    
+    def is_current(self, key, future):
+        """future 是否仍是该键最新提交的任务"""
+        return self._latest.get(key, future) is future and future not in self._superseded
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _done(self, key, future, on_done):
+        with self._lock:
+            self._pending -= 1
+            current = key is None or self._latest.get(key) is future
+            if key is not None and current:
+                del self._latest[key]  # 不再持有已完成任务的结果
+        self._notify()
+        if current and not future.cancelled() and on_done is not None:
+            on_done(future)
+    
+    def _notify(self):
+        metrics.gauge('jobs.depth', self._pending)
+        if self.on_change is not None:
+            self.on_change(self._pending)
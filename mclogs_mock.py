@@ -0,0 +1,271 @@
+"""本地模拟 mclo.gs API 服务器（用于压力测试、基准测试与离线调试）
+
+实现 POST /1/log、GET /1/insights/{id}、/1/raw/{id}、/1/download/{id}，
+可配置响应延迟、错误率与按客户端的限流（超出时返回 429 和 Retry-After）。
+
+用法示例:
+    python mclogs_mock.py --port 8080 --latency 0.2 --error-rate 0.05 --rate-limit 60
+    然后在"配置"页把自定义API端点设为 http://127.0.0.1:8080/1
+    
+    server = MockMclogsServer(latency=0.1).start()
+    api = ApiClient(server.api_base)
+    ...
+    server.stop()
+"""
+import argparse
+import gzip
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from mclogs_core import LocalAnalyzer, LOG_LINE_PATTERN
+
+
+class MockMclogsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    ROUTES = (
+        ('POST', re.compile(r'/1/log/?$'), 'create_log'),
+        ('GET', re.compile(r'/1/insights/(\w+)$'), 'insights'),
+        ('GET', re.compile(r'/1/raw/(\w+)$'), 'raw'),
+        ('GET', re.compile(r'/1/download/(\w+)$'), 'download'),
+        ('GET', re.compile(r'/(\w+)$'), 'raw'),  # 分享链接，浏览器中直接显示原文
+    )
+    
+    def do_GET(self):
+        self._dispatch('GET')
+    
+    def do_POST(self):
+        self._dispatch('POST')
+    
+    def _dispatch(self, method):
+        """统一处理：读取请求体、模拟延迟、限流与随机错误，再交给具体端点"""
+        body = self._read_body() if method == 'POST' else b''
+        server = self.server
+        server.count('bytes_received', len(body))
+        server.simulate_latency()
+        
+        retry_after = server.check_rate_limit(self.client_address[0])
+        if retry_after:
+            return self._reply_json(429, {'success': False, 'error': "Too many requests"},
+                                    {'Retry-After': str(retry_after)})
+        if server.should_fail():
+            return self._reply_json(503, {'success': False, 'error': "Simulated server error"})
+        
+        path = urlparse(self.path).path
+        for route_method, pattern, name in self.ROUTES:
+            match = pattern.match(path)
+            if match and route_method == method:
+                return getattr(self, name)(body, *match.groups())
+        self._reply_json(404, {'success': False, 'error': "Not found"})
+    
+    def create_log(self, body):
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            try:
+                body = gzip.decompress(body)
+            except OSError:
+                return self._reply_json(400, {'success': False, 'error': "Invalid gzip body"})
+        content = parse_qs(body.decode('utf-8', errors='replace')).get('content', [''])[0]
+        if not content:
+            return self._reply_json(400, {'success': False,
+                                          'error': "Required POST argument 'content' is empty."})
+        
+        log_id = self.server.add_log(content)
+        self._reply_json(200, {'success': True, 'id': log_id,
+                               'url': f"{self.server.site_base}/{log_id}",
+                               'raw': f"{self.server.api_base}/raw/{log_id}"})
+    
+    def insights(self, body, log_id):
+        content = self.server.logs.get(log_id)
+        if content is None:
+            return self._reply_json(404, {'success': False, 'error': "Log not found."})
+        self._reply_json(200, self.server.insights_for(log_id, content))
+    
+    def raw(self, body, log_id):
+        content = self.server.logs.get(log_id)
+        if content is None:
+            return self._reply_json(404, {'success': False, 'error': "Log not found."})
+        self._reply(200, content.encode('utf-8'), 'text/plain; charset=utf-8')
+    
+    def download(self, body, log_id):
+        content = self.server.logs.get(log_id)
+        if content is None:
+            return self._reply_json(404, {'success': False, 'error': "Log not found."})
+        self._reply(200, content.encode('utf-8'), 'text/plain; charset=utf-8',
+                    {'Content-Disposition': f'attachment; filename="{log_id}.log"'})
+    
+    def _read_body(self):
+        """读取请求体（支持分块传输编码）"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(parts)
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    
+    def _reply_json(self, status, data, headers=None):
+        self._reply(status, json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                    'application/json', headers)
+    
+    def _reply(self, status, body, content_type, headers=None):
+        self.server.count(f"status_{status}")
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockMclogsServer(ThreadingHTTPServer):
+    """在后台线程中运行的模拟服务器，收到的日志保存在内存中
+    
+    latency/jitter: 每个请求的延迟（秒）及随机抖动；error_rate: 返回 503 的概率；
+    rate_limit: 每个客户端在 rate_window 秒内允许的请求数（0 表示不限流）。
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit=0, rate_window=60.0, seed=None, verbose=False):
+        super().__init__((host, port), MockMclogsHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.verbose = verbose
+        self.logs = {}
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._windows = {}  # 客户端 -> [窗口开始时间, 已用请求数]
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    @property
+    def site_base(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    @property
+    def api_base(self):
+        return f"{self.site_base}/1"
+    
+    def count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+            if name.startswith('status_'):
+                self.stats['requests'] += 1
+    
+    def add_log(self, content):
+        with self._lock:
+            log_id = f"mock{len(self.logs) + 1}"
+            self.logs[log_id] = content
+        return log_id
+    
+    def simulate_latency(self):
+        delay = self.latency + self._uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+    
+    def should_fail(self):
+        return self.error_rate > 0 and self._uniform(0, 1) < self.error_rate
+    
+    def check_rate_limit(self, client):
+        """固定窗口限流：超出时返回需要等待的秒数，否则返回0"""
+        if not self.rate_limit:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(client)
+            if window is None or now - window[0] >= self.rate_window:
+                window = self._windows[client] = [now, 0]
+            if window[1] >= self.rate_limit:
+                return max(1, math.ceil(window[0] + self.rate_window - now))
+            window[1] += 1
+        return 0
+    
+    def insights_for(self, log_id, content):
+        """用本地分析器生成与 mclo.gs 格式相近的分析结果"""
+        lines = content.split('\n')
+        problems = []
+        for problem in LocalAnalyzer().analyze_lines(lines):
+            line = lines[problem['line'] - 1]
+            level = LOG_LINE_PATTERN.match(line).group('level') or 'ERROR'
+            problems.append({
+                'message': problem['message'],
+                'counter': problem['count'],
+                'entry': {'level': level.upper(), 'time': None,
+                          'prefix': '', 'lines': [{'number': problem['line'], 'content': line}]},
+                'solutions': [],
+            })
+        return {'id': log_id, 'name': "Minecraft Log", 'type': "Mock", 'version': None,
+                'title': "Minecraft Log",
+                'analysis': {'problems': problems, 'information': [
+                    {'message': f"Lines: {len(lines)}", 'counter': 1, 'label': "Lines",
+                     'value': len(lines), 'entry': None},
+                ]}}
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+    
+    def _uniform(self, low, high):
+        with self._lock:
+            return self._random.uniform(low, high)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="本地模拟 mclo.gs API 服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的延迟(秒)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟的随机抖动(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回 503 的概率 (0-1)")
+    parser.add_argument('--rate-limit', type=int, default=0, help="每个客户端每个窗口允许的请求数，0 为不限流")
+    parser.add_argument('--rate-window', type=float, default=60.0, help="限流窗口(秒)")
+    parser.add_argument('--seed', type=int, help="随机种子（使错误序列可重现）")
+    parser.add_argument('--verbose', action='store_true', help="输出访问日志")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = MockMclogsServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, rate_limit=args.rate_limit,
+                              rate_window=args.rate_window, seed=args.seed, verbose=args.verbose)
+    print(f"模拟 mclo.gs API 已启动: {server.api_base}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"统计: {dict(server.stats)}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())